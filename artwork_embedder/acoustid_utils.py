@@ -1,15 +1,313 @@
 """
 artwork_embedder.acoustid_utils
 Utilities for AcoustID fingerprint recognition.
+
+Fingerprints are cached on disk, keyed by file size/mtime and by a hash
+of the audio payload (ID3 tags excluded), so re-runs and files with
+identical audio skip decoding. Missing fingerprints can be computed in
+a process pool with fingerprint_files.
 """
 
+import gzip
+import hashlib
+import multiprocessing
 import os
-import acoustid
-from dotenv import load_dotenv
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode
+
+from . import http_client, metrics
+from .utils import cache_dir
+
+# AcoustID API key, read from the environment (or a .env file) on first use.
+ACOUSTID_API_KEY = None
+
+# Seconds of audio analysed per fingerprint, and processes used by fingerprint_files.
+FINGERPRINT_DURATION = 120
+FINGERPRINT_WORKERS = os.cpu_count() or 1
+
+LOOKUP_URL = os.getenv("ARTWORK_EMBEDDER_ACOUSTID_URL", "https://api.acoustid.org/v2/lookup")
+# Fingerprints sent per lookup request.
+LOOKUP_BATCH_SIZE = 20
+
+def configure(duration=None, workers=None, batch_size=None):
+    """
+    Set fingerprinting options.
+
+    Args:
+        duration (int, optional): Seconds of audio analysed per file.
+        workers (int, optional): Processes used to fingerprint several files.
+        batch_size (int, optional): Fingerprints sent per AcoustID lookup request.
+    """
+    global FINGERPRINT_DURATION, FINGERPRINT_WORKERS, LOOKUP_BATCH_SIZE
+    if duration is not None:
+        FINGERPRINT_DURATION = duration
+    if workers is not None:
+        FINGERPRINT_WORKERS = max(1, workers)
+    if batch_size is not None:
+        LOOKUP_BATCH_SIZE = max(1, batch_size)
+
+def api_key():
+    """Return the AcoustID API key, loading .env the first time it is needed."""
+    global ACOUSTID_API_KEY
+    if ACOUSTID_API_KEY is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        ACOUSTID_API_KEY = os.getenv("ACOUSTID_API_KEY") or ""
+    return ACOUSTID_API_KEY
+
+def audio_hash(path):
+    """
+    Hash the audio payload of an MP3, skipping ID3v2 and ID3v1 tags.
+
+    Retagging a file (e.g. embedding artwork) does not change its hash.
+
+    Args:
+        path (Path): Path to the MP3 file.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        start = 0
+        f.seek(0)
+        header = f.read(10)
+        if len(header) == 10 and header[:3] == b"ID3":
+            # Synchsafe tag size, plus the 10-byte header and optional footer.
+            tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+        end = size
+        if size - start >= 128:
+            f.seek(size - 128)
+            if f.read(3) == b"TAG":
+                end = size - 128
+        f.seek(start)
+        remaining = max(end - start, 0)
+        while remaining:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+class FingerprintCache:
+    """SQLite store of (file stat -> audio hash) and (audio hash -> fingerprint)."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, audio_hash TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " audio_hash TEXT NOT NULL, maxlength INTEGER NOT NULL, duration REAL NOT NULL,"
+            " fingerprint TEXT NOT NULL, PRIMARY KEY (audio_hash, maxlength));"
+        )
+        self._conn.commit()
+
+    def file_hash(self, path):
+        """Return the audio hash of path, computing and storing it if its stat changed."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, audio_hash FROM files WHERE path = ?",
+                                     (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        digest = audio_hash(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, audio_hash) VALUES (?, ?, ?, ?)",
+                               (path, st.st_size, st.st_mtime_ns, digest))
+            self._conn.commit()
+        return digest
+
+    def get(self, digest, maxlength):
+        """Return (duration, fingerprint) for an audio hash, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT duration, fingerprint FROM fingerprints WHERE audio_hash = ? AND maxlength = ?",
+                (digest, maxlength),
+            ).fetchone()
+
+    def put(self, digest, maxlength, duration, fingerprint):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (audio_hash, maxlength, duration, fingerprint)"
+                " VALUES (?, ?, ?, ?)",
+                (digest, maxlength, duration, fingerprint),
+            )
+            self._conn.commit()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _get_cache():
+    """Return the shared FingerprintCache, or None if it cannot be opened."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = FingerprintCache(cache_dir() / "fingerprints.sqlite")
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Fingerprint cache unavailable: {e}")
+                return None
+        return _cache
+
+def _compute_fingerprint(path, maxlength):
+    """Decode and fingerprint one file (runs in worker processes)."""
+    import acoustid
+
+    duration, fingerprint = acoustid.fingerprint_file(str(path), maxlength=maxlength)
+    if isinstance(fingerprint, bytes):
+        fingerprint = fingerprint.decode("ascii")
+    return duration, fingerprint
+
+def _timed_fingerprint(path, maxlength):
+    """Worker entry point: fingerprint one file and report how long decoding took."""
+    started = time.perf_counter()
+    value = _compute_fingerprint(path, maxlength)
+    return value, time.perf_counter() - started
+
+def fingerprint_files(paths, workers=None):
+    """
+    Fingerprint several files, reusing cached results and decoding the rest in parallel.
 
-# Load environment variable for AcoustID API key
-load_dotenv()
-ACOUSTID_API_KEY = os.getenv("ACOUSTID_API_KEY")
+    Args:
+        paths (iterable of Path): Files to fingerprint.
+        workers (int, optional): Processes for decoding; defaults to FINGERPRINT_WORKERS.
+
+    Returns:
+        dict: Path -> (duration, fingerprint). Files that failed are left out
+        after a warning is printed.
+    """
+    maxlength = FINGERPRINT_DURATION
+    workers = FINGERPRINT_WORKERS if workers is None else workers
+    cache = _get_cache()
+    results, todo = {}, {}
+    for path in paths:
+        try:
+            digest = cache.file_hash(path) if cache else None
+        except OSError as e:
+            print(f"⚠️ AcoustID error for {path.name}: {e}")
+            continue
+        cached = cache.get(digest, maxlength) if cache else None
+        if cached:
+            metrics.incr("fingerprints_total", result="cached")
+            results[path] = tuple(cached)
+        elif digest in todo:
+            # Same audio as a file already queued: decode it only once.
+            todo[digest].append(path)
+        else:
+            todo[digest or str(path)] = [path]
+
+    if not todo:
+        return results
+
+    def record(digest, group, timed_value):
+        value, seconds = timed_value
+        metrics.observe("stage_seconds", seconds, stage="fingerprint")
+        metrics.incr("fingerprints_total", result="computed")
+        for path in group:
+            results[path] = value
+        if cache:
+            cache.put(digest, maxlength, *value)
+
+    if workers <= 1 or len(todo) == 1:
+        for digest, group in todo.items():
+            try:
+                record(digest, group, _timed_fingerprint(group[0], maxlength))
+            except Exception as e:
+                metrics.incr("fingerprints_total", result="error")
+                print(f"⚠️ AcoustID error for {group[0].name}: {e}")
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {digest: pool.submit(_timed_fingerprint, group[0], maxlength)
+                   for digest, group in todo.items()}
+        for digest, future in futures.items():
+            group = todo[digest]
+            try:
+                record(digest, group, future.result())
+            except Exception as e:
+                metrics.incr("fingerprints_total", result="error")
+                print(f"⚠️ AcoustID error for {group[0].name}: {e}")
+    return results
+
+def _lookup_batch(batch):
+    """
+    Look up several fingerprints in one AcoustID request.
+
+    Args:
+        batch (list of (Path, (duration, fingerprint))): Files and their fingerprints.
+
+    Returns:
+        dict: Index into batch -> list of lookup results for that fingerprint.
+    """
+    import acoustid
+
+    params = {"client": api_key(), "meta": "recordings", "format": "json"}
+    for i, (_, (duration, fingerprint)) in enumerate(batch):
+        params[f"duration.{i}"] = str(int(duration))
+        params[f"fingerprint.{i}"] = fingerprint
+    body = gzip.compress(urlencode(params).encode("ascii"))
+    response = http_client.post(LOOKUP_URL, data=body, headers={
+        "Content-Encoding": "gzip",
+        "Content-Type": "application/x-www-form-urlencoded",
+    })
+    data = response.json()
+    if data.get("status") != "ok":
+        raise acoustid.WebServiceError(data.get("error", {}).get("message", f"status: {data.get('status')}"))
+    if "fingerprints" in data:
+        return {int(entry["index"]): entry.get("results", []) for entry in data["fingerprints"]}
+    # A single fingerprint may be answered in the non-batch format.
+    return {0: data.get("results", [])}
+
+def _best_match(results):
+    """Return "Artist Title" for the first result with both fields, else None."""
+    import acoustid
+
+    for score, rid, title, artist in acoustid.parse_lookup_result({"status": "ok", "results": results}):
+        if title and artist:
+            print(f"🎵 Fingerprinted: {artist} - {title}")
+            return f"{artist} {title}"
+    return None
+
+def recognize_many_with_acoustid(mp3_paths):
+    """
+    Identify many songs by fingerprint, sending LOOKUP_BATCH_SIZE fingerprints per request.
+
+    Args:
+        mp3_paths (iterable of Path): MP3 files to identify.
+
+    Returns:
+        dict: Path -> "Artist Title" string, or None if no match was found.
+    """
+    mp3_paths = list(mp3_paths)
+    matches = dict.fromkeys(mp3_paths)
+    if not api_key():
+        print("⚠️  AcoustID API key not set. Skipping AcoustID lookup.")
+        return matches
+
+    fingerprints = list(fingerprint_files(mp3_paths).items())
+    for start in range(0, len(fingerprints), LOOKUP_BATCH_SIZE):
+        batch = fingerprints[start:start + LOOKUP_BATCH_SIZE]
+        try:
+            with metrics.timed("search", provider="acoustid"):
+                results = _lookup_batch(batch)
+        except Exception as e:
+            metrics.incr("lookups_total", len(batch), provider="acoustid", result="error")
+            print(f"⚠️ AcoustID error for {len(batch)} file(s) starting with {batch[0][0].name}: {e}")
+            continue
+        for i, (path, _) in enumerate(batch):
+            matches[path] = _best_match(results.get(i, []))
+            metrics.incr("lookups_total", provider="acoustid", result="hit" if matches[path] else "miss")
+    return matches
 
 def recognize_with_acoustid(mp3_path):
     """
@@ -21,17 +319,4 @@ def recognize_with_acoustid(mp3_path):
     Returns:
         str or None: A string like "Artist Title" if a match is found, else None.
     """
-    if not ACOUSTID_API_KEY:
-        print("⚠️  AcoustID API key not set. Skipping AcoustID lookup.")
-        return None
-
-    try:
-        results = acoustid.match(ACOUSTID_API_KEY, str(mp3_path))
-        for score, rid, title, artist in results:
-            if title and artist:
-                print(f"🎵 Fingerprinted: {artist} - {title}")
-                return f"{artist} {title}"
-    except Exception as e:
-        print(f"⚠️ AcoustID error for {mp3_path.name}: {e}")
-    return None
-
+    return recognize_many_with_acoustid([mp3_path])[mp3_path]
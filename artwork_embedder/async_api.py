@@ -0,0 +1,221 @@
+"""
+artwork_embedder.async_api
+Asyncio interface that streams typed per-album and per-file results.
+
+``embed_library`` processes a library's album folders from an event loop
+and yields FileResult and AlbumResult events as they complete, instead of
+printing. Provider lookups and downloads run on a bounded thread pool, so
+they keep sharing the HTTP session, per-host rate limits, retries, caches
+and request coalescing with the rest of the process; tag writes go through
+an EmbedExecutor. The event loop itself never blocks, so several libraries
+can be processed concurrently in one loop.
+
+    async for event in embed_library("/music/Radiohead", "Radiohead"):
+        if isinstance(event, AlbumResult):
+            print(event.folder.name, event.status, f"{event.seconds:.1f}s")
+"""
+
+import asyncio
+import io
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .embed import fetch_artwork, find_album_art
+from .embed_executor import EmbedExecutor, report, write_artwork
+from .library_index import LibraryIndex
+from .state import StateManifest
+from .utils import bind_output, image_digest, route_stdout
+
+# Albums of one library processed concurrently.
+CONCURRENCY = 4
+
+FileResult = namedtuple("FileResult", ["album", "path", "status", "error", "seconds"])
+FileResult.__doc__ = """\
+Outcome of writing artwork to one file.
+
+album is the album folder, status is "added", "replaced", "skipped" or
+"failed" (see embed_executor.EmbedResult), error holds the message for
+"failed", and seconds is the time the tag write took.
+"""
+
+AlbumResult = namedtuple("AlbumResult", ["folder", "status", "url", "files", "lookup_seconds",
+                                         "download_seconds", "write_seconds", "seconds", "error", "output"])
+AlbumResult.__doc__ = """\
+Outcome of one album folder, emitted after its FileResult events.
+
+status is "embedded", "not_found", "download_failed", "empty", "skipped"
+(see embed.process_album_folder) or "failed" when an unexpected error
+stopped the album, with its message in error. url is the artwork used,
+files counts the file outcomes by status, the *_seconds fields time the
+provider lookup, the download and normalization, the tag writes and the
+whole album, and output holds the messages the blocking API would have
+printed.
+"""
+
+def configure(concurrency=None):
+    """
+    Set async API options.
+
+    Args:
+        concurrency (int, optional): Albums of one library processed concurrently.
+    """
+    global CONCURRENCY
+    if concurrency is not None:
+        CONCURRENCY = max(1, concurrency)
+
+class _LibraryRun:
+    """State of one embed_library call: index, manifest, executors and the event queue."""
+
+    def __init__(self, root, band_name, force, concurrency, write_workers):
+        self.root = root
+        self.band_name = band_name
+        self.force = force
+        self.loop = asyncio.get_running_loop()
+        # One thread per concurrent album, plus one for bookkeeping.
+        self.threads = ThreadPoolExecutor(max_workers=concurrency + 1, thread_name_prefix="artwork-embedder")
+        self.executor = EmbedExecutor(workers=write_workers)
+        self.events = asyncio.Queue()
+        self.index = None
+        self.state = None
+
+    async def call(self, buffer, fn, *args):
+        """Run fn(*args) on the thread pool with its output collected in buffer."""
+        def bound():
+            with bind_output(buffer):
+                return fn(*args)
+        return await self.loop.run_in_executor(self.threads, bound)
+
+    async def open(self, target_album, rescan):
+        """Refresh the library index and load the state manifest; return the album folders."""
+        def setup():
+            self.index = LibraryIndex(self.root)
+            self.index.refresh(full=rescan)
+            self.state = StateManifest(self.root, force=self.force)
+            return self.index.album_folders(album=target_album)
+        return await self.call(io.StringIO(), setup)
+
+    async def album(self, folder):
+        """Process one album folder, queueing its FileResult events and then its AlbumResult."""
+        started = time.perf_counter()
+        buffer = io.StringIO()
+        files = Counter()
+        timings = {"lookup": 0.0, "download": 0.0, "write": 0.0}
+        url = error = None
+        try:
+            tracks = await self.call(buffer, self.index.album_tracks, folder)
+            pending = await self.call(buffer, lambda: [mp3 for mp3 in tracks if not self.state.is_done(mp3)])
+            if not tracks:
+                status = "empty"
+            elif not pending:
+                status = "skipped"
+            else:
+                step = time.perf_counter()
+                url = await self.call(buffer, find_album_art, folder, self.band_name, pending[0])
+                timings["lookup"] = time.perf_counter() - step
+                if not url:
+                    status = "not_found"
+                else:
+                    step = time.perf_counter()
+                    artwork = await self.call(buffer, fetch_artwork, url)
+                    timings["download"] = time.perf_counter() - step
+                    if not artwork:
+                        status = "download_failed"
+                    else:
+                        step = time.perf_counter()
+                        await self.write(folder, pending, artwork, files, buffer)
+                        timings["write"] = time.perf_counter() - step
+                        status = "embedded"
+        except Exception as e:
+            status, error = "failed", str(e)
+        self.events.put_nowait(AlbumResult(folder, status, url, dict(files), timings["lookup"],
+                                           timings["download"], timings["write"],
+                                           time.perf_counter() - started, error, buffer.getvalue()))
+
+    async def write(self, folder, paths, artwork, files, buffer):
+        """Write artwork into paths, queueing a FileResult as each write finishes."""
+        image_data, mime = artwork
+        digest = image_digest(image_data)
+        if self.executor.workers <= 1:
+            batches = (self.call(buffer, lambda path=path: [write_artwork(path, image_data, mime, digest)])
+                       for path in paths)
+        else:
+            futures = await self.call(buffer, self.executor.submit, paths, image_data, mime)
+            batches = (asyncio.wrap_future(future) for future in futures)
+        for batch in batches:
+            for result in await batch:
+                with bind_output(buffer):
+                    done = report(result)
+                if done:
+                    await self.call(buffer, self.state.mark_done, result.path, digest)
+                files[result.status] += 1
+                self.events.put_nowait(FileResult(folder, result.path, result.status, result.error,
+                                                  result.seconds))
+
+    async def close(self):
+        """Stop the workers, then save the manifest and close the index."""
+        def shutdown():
+            self.threads.shutdown(wait=True, cancel_futures=True)
+            self.executor.close()
+            if self.state is not None:
+                self.state.close()
+            if self.index is not None:
+                self.index.close()
+        await self.loop.run_in_executor(None, shutdown)
+
+async def embed_library(root_path, band_name, target_album=None, force=False, rescan=False,
+                        concurrency=None, write_workers=None):
+    """
+    Embed artwork into a library's album folders, yielding results as they complete.
+
+    Behaves like embed.process_all_folders (same providers, caches, state
+    manifest and library index) but never blocks the event loop and
+    prints nothing.
+
+    Args:
+        root_path (str or Path): Folder containing one subfolder per album.
+        band_name (str): Band name used for artwork search.
+        target_album (str, optional): Only process the album with this name.
+        force (bool): Reprocess files the state manifest reports as done.
+        rescan (bool): Re-list every directory when refreshing the library index.
+        concurrency (int, optional): Albums processed at once; defaults to CONCURRENCY.
+        write_workers (int, optional): Processes writing tags; defaults to
+            embed_executor.WRITE_WORKERS (1 writes on the thread pool).
+
+    Yields:
+        FileResult or AlbumResult: A FileResult per written file and an
+        AlbumResult per album once its files are done, in completion order.
+    """
+    concurrency = CONCURRENCY if concurrency is None else max(1, concurrency)
+    run = _LibraryRun(Path(root_path), band_name, force, concurrency, write_workers)
+    limit = asyncio.Semaphore(concurrency)
+    tasks, driver = [], None
+
+    async def album(folder):
+        async with limit:
+            await run.album(folder)
+
+    async def drive():
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            run.events.put_nowait(None)
+
+    with route_stdout():
+        try:
+            folders = await run.open(target_album, rescan)
+            tasks = [asyncio.ensure_future(album(folder)) for folder in folders]
+            driver = asyncio.ensure_future(drive())
+            while True:
+                event = await run.events.get()
+                if event is None:
+                    break
+                yield event
+            await driver
+        finally:
+            for task in tasks:
+                task.cancel()
+            if driver is not None:
+                driver.cancel()
+            await run.close()
@@ -0,0 +1,248 @@
+"""
+artwork_embedder.clean_engine
+Header-only detection and in-place removal of embedded artwork.
+
+Only the ID3v2 header and frame headers are read; frame payloads
+(including the pictures themselves) are skipped with seeks. Files
+without picture frames are never written. Picture frames are removed
+by moving the frames that follow them forward and zero-filling the
+freed space, which becomes tag padding, so the tag keeps its size and
+the audio is left untouched. Tags whose layout cannot be patched this
+way (ID3v2.2/2.3 unsynchronisation, extended headers, malformed frame
+tables, v2.4 frames with non-syncsafe sizes) are handed to the tag
+backend instead.
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics, registry
+
+# Threads used to scan and clean files. The work is mostly small reads
+# and writes, so threads overlap it well without the start-up cost of
+# processes.
+CLEAN_WORKERS = 8
+# Bytes read with the header; frames beyond it are reached with seeks.
+HEAD_BYTES = 64 * 1024
+# Picture frame IDs for ID3v2.2 and ID3v2.3/2.4.
+PICTURE_IDS = {b"PIC", b"APIC"}
+
+CleanResult = namedtuple("CleanResult", ["path", "status", "pictures", "picture_bytes", "error", "seconds"])
+CleanResult.__doc__ = """\
+Outcome of cleaning (or, in a dry run, scanning) one file.
+
+status is "removed", "would_remove", "no_artwork", "no_tags" or
+"failed". pictures and picture_bytes describe the picture frames found;
+error holds the message for "failed" and is None otherwise.
+"""
+
+_Frame = namedtuple("_Frame", ["id", "offset", "length"])
+
+class UnsupportedTag(Exception):
+    """The tag layout cannot be scanned or patched from its frame headers."""
+
+def configure(workers=None):
+    """
+    Set clean engine options.
+
+    Args:
+        workers (int, optional): Number of threads scanning and cleaning files.
+    """
+    global CLEAN_WORKERS
+    if workers is not None:
+        CLEAN_WORKERS = max(1, workers)
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _valid_id(frame_id):
+    return all(48 <= c <= 57 or 65 <= c <= 90 for c in frame_id)
+
+def _read_at(f, head, offset, size):
+    """Return size bytes at offset, from the already read head when possible."""
+    if offset + size <= len(head):
+        return head[offset:offset + size]
+    f.seek(offset)
+    return f.read(size)
+
+def read_frame_table(f):
+    """
+    Read the frame table of the ID3v2 tag at the start of an open file.
+
+    Args:
+        f (file): File opened in binary mode, positioned anywhere.
+
+    Returns:
+        tuple or None: (frames, frames_end), where frames is a list of
+        (id, offset, length) with offsets from the start of the file and
+        lengths including the frame header, and frames_end is the offset
+        where the frames stop (padding or the end of the tag). None if the
+        file has no ID3v2 tag.
+
+    Raises:
+        UnsupportedTag: The tag cannot be handled from its frame headers.
+    """
+    f.seek(0)
+    head = f.read(HEAD_BYTES)
+    if len(head) < 10 or head[:3] != b"ID3":
+        return None
+    major, flags = head[3], head[5]
+    if major not in (2, 3, 4) or any(b & 0x80 for b in head[6:10]):
+        raise UnsupportedTag(f"ID3v2.{major} header")
+    if flags & 0x40 or (flags & 0x80 and major < 4):
+        raise UnsupportedTag("extended header or tag-level unsynchronisation")
+    tag_end = 10 + _syncsafe(head[6:10])
+    id_size, header_size = (3, 6) if major == 2 else (4, 10)
+
+    frames, offset = [], 10
+    while offset + header_size <= tag_end:
+        header = _read_at(f, head, offset, header_size)
+        if len(header) < header_size:
+            break  # End of file.
+        if header[0] == 0:
+            # Padding is all zeros; a zero byte anywhere else means the
+            # previous frame's size was misread.
+            if any(header):
+                raise UnsupportedTag(f"unexpected data in padding at offset {offset}")
+            break
+        frame_id = header[:id_size]
+        if major == 2:
+            size = int.from_bytes(header[3:6], "big")
+        elif major == 3:
+            size = int.from_bytes(header[4:8], "big")
+        elif any(b & 0x80 for b in header[4:8]):
+            # Some encoders write plain 32-bit sizes into v2.4 tags.
+            raise UnsupportedTag(f"non-syncsafe frame size at offset {offset}")
+        else:
+            size = _syncsafe(header[4:8])
+        if not _valid_id(frame_id) or offset + header_size + size > tag_end:
+            raise UnsupportedTag(f"malformed frame at offset {offset}")
+        frames.append(_Frame(frame_id, offset, header_size + size))
+        offset += header_size + size
+    return frames, offset
+
+def scan_artwork(path):
+    """
+    Count the picture frames of a file without reading their payloads.
+
+    Args:
+        path (Path): Path to the MP3 file.
+
+    Returns:
+        tuple or None: (pictures, picture_bytes), or None if the file has no ID3v2 tag.
+
+    Raises:
+        UnsupportedTag: The tag cannot be handled from its frame headers.
+    """
+    with open(path, "rb") as f:
+        table = read_frame_table(f)
+    if table is None:
+        return None
+    pictures = [frame for frame in table[0] if frame.id in PICTURE_IDS]
+    return len(pictures), sum(frame.length for frame in pictures)
+
+def strip_in_place(path):
+    """
+    Remove every picture frame from path inside the existing tag.
+
+    Frames after the first picture are moved forward over the removed
+    ones and the freed bytes are zeroed, so the tag size, the rest of
+    the tag and the audio stay where they are. Nothing is written when
+    there is no picture.
+
+    Args:
+        path (Path): Path to the MP3 file.
+
+    Returns:
+        tuple: (status, pictures, picture_bytes), where status is
+        "removed", "no_artwork" or "no_tags".
+
+    Raises:
+        UnsupportedTag: The tag cannot be handled from its frame headers.
+    """
+    with open(path, "r+b") as f:
+        table = read_frame_table(f)
+        if table is None:
+            return "no_tags", 0, 0
+        frames, frames_end = table
+        pictures = [frame for frame in frames if frame.id in PICTURE_IDS]
+        if not pictures:
+            return "no_artwork", 0, 0
+        start = pictures[0].offset
+        kept = []
+        for frame in frames:
+            if frame.offset > start and frame.id not in PICTURE_IDS:
+                f.seek(frame.offset)
+                kept.append(f.read(frame.length))
+        data = b"".join(kept)
+        f.seek(start)
+        f.write(data)
+        remaining = frames_end - start - len(data)
+        while remaining > 0:
+            chunk = min(remaining, 1024 * 1024)
+            f.write(b"\x00" * chunk)
+            remaining -= chunk
+    return "removed", len(pictures), sum(frame.length for frame in pictures)
+
+def _clean_with_backend(path, dry_run):
+    """Clean or scan a file through the tag backend, for tags strip_in_place cannot patch."""
+    backend = registry.tag_backend()
+    pictures = backend.load_tags(path).getall("APIC")
+    count, size = len(pictures), sum(len(p.data) for p in pictures)
+    if dry_run:
+        return ("would_remove" if count else "no_artwork"), count, size
+    status = backend.strip_artwork(path)
+    return status, (count if status == "removed" else 0), (size if status == "removed" else 0)
+
+def clean_file(path, dry_run=False):
+    """
+    Remove the artwork of one file, or only report it in a dry run, without printing.
+
+    Args:
+        path (Path): Path to the MP3 file.
+        dry_run (bool): Only scan; report "would_remove" instead of writing.
+
+    Returns:
+        CleanResult: Outcome for path.
+    """
+    started = time.perf_counter()
+    try:
+        try:
+            if dry_run:
+                found = scan_artwork(path)
+                if found is None:
+                    status, pictures, size = "no_tags", 0, 0
+                else:
+                    status, pictures, size = ("would_remove" if found[0] else "no_artwork"), *found
+            else:
+                status, pictures, size = strip_in_place(path)
+        except UnsupportedTag:
+            status, pictures, size = _clean_with_backend(path, dry_run)
+        error = None
+    except Exception as e:
+        status, pictures, size, error = "failed", 0, 0, str(e)
+    seconds = time.perf_counter() - started
+    metrics.observe("stage_seconds", seconds, stage="clean")
+    metrics.incr("files_total", status=status)
+    return CleanResult(path, status, pictures, size, error, seconds)
+
+def clean_many(paths, dry_run=False, workers=None):
+    """
+    Clean (or scan) files on a thread pool.
+
+    Args:
+        paths (iterable of Path): Files to clean.
+        dry_run (bool): Only scan the files.
+        workers (int, optional): Threads to use; defaults to CLEAN_WORKERS.
+
+    Yields:
+        CleanResult: One per file, in the order of paths.
+    """
+    workers = CLEAN_WORKERS if workers is None else workers
+    if workers <= 1:
+        for path in paths:
+            yield clean_file(path, dry_run)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(lambda path: clean_file(path, dry_run), paths)
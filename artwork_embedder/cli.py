@@ -5,11 +5,34 @@ Command-line interface for the artwork embedder tool.
 
 import argparse
 from pathlib import Path
-from dotenv import load_dotenv
-import os
 
-from artwork_embedder.embed import process_all_folders, process_files_individually, clean_album_art, download_cover_from_musicbrainz_id
-from artwork_embedder.utils import clean_album_name
+from artwork_embedder.library_index import LibraryIndex
+from artwork_embedder import utils
+from artwork_embedder.utils import set_cache_dir
+from artwork_embedder import acoustid_utils, clean_engine, embed_executor, http_client, image_cache, image_utils, lookup, lookup_cache, metrics, musicbrainz_utils, provider_stats, scheduler, walker, watcher
+
+PROVIDER_NAMES = ("itunes", "musicbrainz", "acoustid")
+
+def _rate_limit(value):
+    """Parse HOST=RATE[:BURST] into (host, (rate, burst))."""
+    try:
+        host, limit = value.split("=", 1)
+        rate, _, burst = limit.partition(":")
+        rate = float(rate)
+        return host.strip().lower(), (rate, int(burst) if burst else max(1, int(rate)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST=RATE[:BURST], got {value!r}")
+
+def _provider_order(value):
+    """Parse "adaptive" or a comma-separated list of provider names."""
+    if value == "adaptive":
+        return None
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PROVIDER_NAMES]
+    if not names or unknown:
+        raise argparse.ArgumentTypeError(
+            f"expected 'adaptive' or a comma-separated list of {', '.join(PROVIDER_NAMES)}, got {value!r}")
+    return names
 
 def main():
     """Parse arguments and trigger the corresponding operations."""
@@ -32,36 +55,223 @@ def main():
                         metavar='"CLEAN_ALBUM"',
                         help='Album name to clean (removes embedded artwork).')
     
+    parser.add_argument("--dry-run", action="store_true",
+                        help="With --clean-album: only count the files and bytes of artwork that would be removed.")
+
+    parser.add_argument("--clean-workers", type=int, default=clean_engine.CLEAN_WORKERS,
+                        metavar="N",
+                        help="Threads used to scan and clean files with --clean-album (default: %(default)s).")
+
     parser.add_argument("--brainz", type=str,
                         metavar='"BRAINZ_RELEASE_ID"',
                         help='MusicBrainz release ID to embed artwork directly.')
     
+    parser.add_argument("--jobs", type=int, default=1,
+                        metavar="N",
+                        help="Number of albums to process concurrently in --folders mode (default: 1).")
+
+    parser.add_argument("--connect-timeout", type=float, default=http_client.CONNECT_TIMEOUT,
+                        metavar="SECONDS",
+                        help=f"HTTP connect timeout (default: {http_client.CONNECT_TIMEOUT}).")
+
+    parser.add_argument("--read-timeout", type=float, default=http_client.READ_TIMEOUT,
+                        metavar="SECONDS",
+                        help=f"HTTP read timeout (default: {http_client.READ_TIMEOUT}).")
+
+    parser.add_argument("--cache-dir", type=str,
+                        metavar='"CACHE_DIR"',
+                        help="Directory for on-disk caches (default: ~/.cache/artwork-embedder).")
+
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached artwork lookups and query the providers again.")
+
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the on-disk lookup and image caches.")
+
+    parser.add_argument("--image-cache-mb", type=int, default=image_cache.MAX_BYTES // (1024 * 1024),
+                        metavar="MB",
+                        help="Size cap of the downloaded image cache in MB (default: %(default)s).")
+
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess files the library state manifest reports as already done.")
+
+    parser.add_argument("--hedge", type=float,
+                        metavar="SECONDS",
+                        help="Start the next artwork provider after SECONDS instead of waiting "
+                             "for the previous one to fail (0 starts all at once).")
+
+    parser.add_argument("--provider-order", type=_provider_order, default=None,
+                        metavar="ORDER",
+                        help="'adaptive' (default) orders providers by their recorded hit rate and latency "
+                             "for the band or library; a list such as itunes,musicbrainz,acoustid pins "
+                             "the order and skips unlisted providers.")
+
+    parser.add_argument("--caa-fanout", type=int, default=musicbrainz_utils.CAA_FANOUT,
+                        metavar="N",
+                        help="Cover Art Archive releases probed concurrently per album (default: %(default)s).")
+
+    parser.add_argument("--release-group-art", action="store_true",
+                        help="Try the release group's cover art before individual releases.")
+
+    parser.add_argument("--max-art-size", type=int, default=image_utils.MAX_DIMENSION,
+                        metavar="PIXELS",
+                        help="Scale embedded artwork down to at most this many pixels per side (default: %(default)s).")
+
+    parser.add_argument("--jpeg-quality", type=int, default=image_utils.JPEG_QUALITY,
+                        metavar="Q",
+                        help="JPEG quality used when artwork is re-encoded (default: %(default)s).")
+
+    parser.add_argument("--max-art-kb", type=int, default=image_utils.MAX_BYTES // 1024,
+                        metavar="KB",
+                        help="Byte budget for embedded artwork in KB (default: %(default)s).")
+
+    parser.add_argument("--rescan", action="store_true",
+                        help="Re-list every directory of the library index, ignoring directory mtimes.")
+
+    parser.add_argument("--walk-workers", type=int, default=walker.WALK_WORKERS,
+                        metavar="N",
+                        help="Directories listed in parallel when indexing or walking the library (default: %(default)s).")
+
+    parser.add_argument("--write-workers", type=int, default=embed_executor.WRITE_WORKERS,
+                        metavar="N",
+                        help="Processes used to write tags (default: %(default)s, i.e. in-process).")
+
+    parser.add_argument("--fingerprint-seconds", type=int, default=acoustid_utils.FINGERPRINT_DURATION,
+                        metavar="SECONDS",
+                        help="Seconds of audio analysed for AcoustID fingerprints (default: %(default)s).")
+
+    parser.add_argument("--fingerprint-workers", type=int, default=acoustid_utils.FINGERPRINT_WORKERS,
+                        metavar="N",
+                        help="Processes used to fingerprint several files (default: CPU count).")
+
+    parser.add_argument("--acoustid-batch", type=int, default=acoustid_utils.LOOKUP_BATCH_SIZE,
+                        metavar="N",
+                        help="Fingerprints sent per AcoustID lookup request (default: %(default)s).")
+
+    parser.add_argument("--max-download-mb", type=float, default=utils.MAX_DOWNLOAD_BYTES / (1024 * 1024),
+                        metavar="MB",
+                        help="Abort image downloads larger than this (default: %(default)s).")
+
+    parser.add_argument("--rate-limit", type=_rate_limit, action="append", default=[],
+                        metavar="HOST=RATE[:BURST]",
+                        help="Requests per second (and burst) allowed to HOST; 0 removes the limit. Repeatable.")
+
+    parser.add_argument("--max-retries", type=int, default=scheduler.MAX_RETRIES,
+                        metavar="N",
+                        help="Retries of a request answered with 429/503 (default: %(default)s).")
+
+    parser.add_argument("--metrics-out", type=str,
+                        metavar='"PATH"',
+                        help="Write run metrics to PATH: a Prometheus textfile if it ends in .prom, else JSON lines.")
+
+    parser.add_argument("--profile", action="store_true",
+                        help="Print time spent per stage and provider counters at the end of the run.")
+
+    parser.add_argument("--watch", action="store_true",
+                        help="With --folders: after processing the library, keep running and process "
+                             "album folders as they are added or changed.")
+
+    parser.add_argument("--debounce", type=float, default=watcher.DEBOUNCE_SECONDS,
+                        metavar="SECONDS",
+                        help="In --watch mode, wait until a folder has not changed for this long "
+                             "(default: %(default)s).")
+
+    parser.add_argument("--poll", action="store_true",
+                        help="In --watch mode, poll for changes instead of using inotify "
+                             "(e.g. on network shares).")
+
+    parser.add_argument("--poll-interval", type=float, default=watcher.POLL_INTERVAL,
+                        metavar="SECONDS",
+                        help="Seconds between library scans when polling (default: %(default)s).")
+
     # Mode flags
     mode_group = parser.add_mutually_exclusive_group(required=True)
     mode_group.add_argument("--folders", action="store_true", help="Process album subfolders.")
     mode_group.add_argument("--files", action="store_true", help="Process MP3s at the top level.")
 
     args = parser.parse_args()
-    load_dotenv()
+    if args.dry_run and not args.clean_album:
+        parser.error("--dry-run is only supported with --clean-album")
+    if args.watch and (not args.folders or args.album or args.clean_album or args.brainz):
+        parser.error("--watch requires --folders and cannot be combined with --album, --clean-album or --brainz")
     root = Path(args.music_folder)
+    http_client.configure(connect_timeout=args.connect_timeout,
+                          read_timeout=args.read_timeout,
+                          pool_size=max(http_client.POOL_SIZE, args.jobs))
+    scheduler.configure(rate_limits=dict(args.rate_limit), max_retries=args.max_retries)
+    set_cache_dir(args.cache_dir)
+    utils.configure(max_download_bytes=int(args.max_download_mb * 1024 * 1024))
+    lookup_cache.configure(enabled=not args.no_cache, refresh=args.refresh)
+    lookup.configure(hedge_delay=args.hedge, provider_order=args.provider_order)
+    provider_stats.configure(enabled=not args.no_cache)
+    walker.configure(workers=args.walk_workers)
+    embed_executor.configure(workers=args.write_workers)
+    acoustid_utils.configure(duration=args.fingerprint_seconds, workers=args.fingerprint_workers,
+                             batch_size=args.acoustid_batch)
+    image_utils.configure(max_dimension=args.max_art_size, jpeg_quality=args.jpeg_quality,
+                          max_bytes=args.max_art_kb * 1024)
+    musicbrainz_utils.configure(fanout=args.caa_fanout, prefer_release_group=args.release_group_art)
+    image_cache.configure(enabled=not args.no_cache, max_bytes=args.image_cache_mb * 1024 * 1024)
+    clean_engine.configure(workers=args.clean_workers)
+    watcher.configure(debounce=args.debounce, poll_interval=args.poll_interval)
+
+    try:
+        _run(args, root)
+    finally:
+        if args.metrics_out:
+            metrics.write(args.metrics_out)
+        if args.profile:
+            metrics.print_profile()
 
+def _run(args, root):
+    """Run the operation selected on the command line, importing only what that mode needs."""
     if args.brainz:
         if not args.album:
             print("Please provide --album along with --brainz.")
             exit(1)
-        for folder in root.iterdir():
-            if folder.is_dir() and clean_album_name(folder.name).lower() == args.album.lower():
-                download_cover_from_musicbrainz_id(args.brainz, folder)
-                return
+        index = LibraryIndex(root)
+        index.refresh(recursive=False)
+        folders = index.album_folders(album=args.album)
+        index.close()
+        if folders:
+            from artwork_embedder.embed import download_cover_from_musicbrainz_id
+            download_cover_from_musicbrainz_id(args.brainz, folders[0])
+            return
         print(f"Album '{args.album}' not found in {args.music_folder}")
         return
 
     if args.clean_album:
-        clean_album_art(args.music_folder, args.clean_album)
+        from artwork_embedder.embed import clean_album_art
+        clean_album_art(args.music_folder, args.clean_album, rescan=args.rescan, dry_run=args.dry_run)
     elif args.files:
-        process_files_individually(args.music_folder, args.band)
+        from artwork_embedder.embed import process_files_individually
+        process_files_individually(args.music_folder, args.band, force=args.force)
+    elif args.watch:
+        _watch(args)
     elif args.folders:
-        process_all_folders(args.music_folder, args.band, target_album=args.album)
+        from artwork_embedder.embed import format_summary, process_all_folders
+        summary = process_all_folders(args.music_folder, args.band,
+                                      target_album=args.album, jobs=args.jobs,
+                                      force=args.force, rescan=args.rescan)
+        if args.jobs > 1:
+            print("\nSummary: " + format_summary(summary))
+
+def _watch(args):
+    """Run --folders --watch until interrupted, stopping cleanly on SIGTERM."""
+    import signal
+    import threading
+
+    from artwork_embedder.embed import watch_library
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    def after_batch(summary):
+        if args.metrics_out and args.metrics_out.endswith(".prom"):
+            metrics.write(args.metrics_out)
+
+    watch_library(args.music_folder, args.band, jobs=args.jobs, force=args.force, rescan=args.rescan,
+                  polling=args.poll, stop=stop, after_batch=after_batch)
 
 if __name__ == "__main__":
     main()
@@ -3,149 +3,481 @@ artwork_embedder.embed
 Core logic for embedding and cleaning album artwork in MP3 files.
 """
 
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-import music_tag
-from mutagen.id3 import ID3, APIC
-from mutagen.mp3 import MP3
 
-from .itunes_utils import search_album_art
-from .musicbrainz_utils import search_album_art_musicbrainz
-from .acoustid_utils import recognize_with_acoustid
-from .utils import download_image, clean_album_name
+from . import clean_engine, http_client, lookup, metrics, musicbrainz_utils, provider_stats, registry, watcher
+from .embed_executor import EmbedExecutor, report, write_artwork
+from .image_utils import normalize_image
+from .library_index import LibraryIndex
+from .lookup_cache import normalize_query
+from .state import StateManifest
+from .walker import iter_mp3_files
+from .utils import download_image, clean_album_name, image_digest, route_stdout, bind_output
 
-def embed_artwork(mp3_path, image_data, band_name):
-    """Embed album artwork into a given MP3 file."""
+def embed_artwork(mp3_path, image_data, *, mime="image/jpeg"):
+    """
+    Embed album artwork into a given MP3 file.
+
+    Args:
+        mp3_path (Path): Path to the MP3 file.
+        image_data (bytes): Image content, normally from normalize_image.
+        mime (str): MIME type of image_data; keyword-only, so a band name
+            passed positionally, as earlier versions took, is rejected.
+
+    Returns:
+        bool: True if the file carries the artwork afterwards (embedded or
+        already present), False if embedding failed.
+    """
     if not image_data:
         print(f"No image data for {mp3_path.name}")
-        return
-    try:
-        f = music_tag.load_file(mp3_path)
-        current_artist = str(f['artist']).lower()
-        has_art = f['artwork'].value is not None
-        if has_art and band_name.lower() in current_artist:
-            print(f"Skipping (correct artwork already present): {mp3_path.name}")
-            return
-        if has_art and band_name.lower() not in current_artist:
-            print(f"Replacing potentially incorrect artwork in: {mp3_path.name}")
-        f['artwork'] = image_data
-        f.save()
-        print(f"Embedded artwork with music-tag: {mp3_path.name}")
-    except Exception as e:
-        print(f"music-tag failed on {mp3_path.name}, trying mutagen...")
-        try:
-            audio = MP3(mp3_path, ID3=ID3)
-            if audio.tags is None:
-                audio.add_tags()
-            audio.tags.delall("APIC")
-            audio.tags.add(
-                APIC(
-                    encoding=3,
-                    mime='image/jpeg',
-                    type=3,
-                    desc='Cover',
-                    data=image_data
-                )
-            )
-            audio.save()
-            print(f"Embedded artwork with mutagen: {mp3_path.name}")
-        except Exception as e2:
-            print(f"Failed to embed artwork in {mp3_path.name}: {e2}")
-
-def process_album_folder(folder_path, band_name):
-    """Process a folder of MP3s using band and album names for artwork search."""
+        return False
+    return report(write_artwork(mp3_path, image_data, mime))
+
+def process_album_folder(folder_path, band_name, state=None, mp3_files=None, executor=None):
+    """
+    Process a folder of MP3s using band and album names for artwork search.
+
+    Args:
+        folder_path (str or Path): Album folder.
+        band_name (str): Band name used for artwork search.
+        state (StateManifest, optional): Manifest of completed files. Files it
+            reports as done are skipped; newly embedded files are recorded.
+        mp3_files (iterable of Path, optional): Tracks of the album, e.g. from the
+            library index. If omitted, the folder is walked lazily, and the
+            lookup starts as soon as the first pending track is found.
+        executor (EmbedExecutor, optional): Executor for the tag writes. Files are
+            written one at a time in this thread if omitted.
+
+    Returns:
+        str: Outcome of the album, one of "embedded", "not_found",
+        "download_failed", "empty" or "skipped".
+    """
     folder = Path(folder_path)
-    mp3_files = list(folder.rglob("*.mp3"))
-    if not mp3_files:
-        print(f"No MP3s in {folder.name}")
-        return
+    if mp3_files is None:
+        mp3_files = iter_mp3_files(folder)
+    seen = 0
+
+    def pending_files():
+        nonlocal seen
+        for mp3 in mp3_files:
+            seen += 1
+            if state is None or not state.is_done(mp3):
+                yield mp3
+
+    pending = pending_files()
+    first = next(pending, None)
+    if first is None:
+        if not seen:
+            print(f"No MP3s in {folder.name}")
+            return "empty"
+        print(f"Skipping (unchanged since last run): {folder.name}")
+        return "skipped"
     print(f"\nProcessing folder: {folder.name}")
-    album_name = clean_album_name(folder.name)
-    search_query = f"{band_name} {album_name}"
-    album_art_url = search_album_art(search_query, expected_artist=band_name)
-    if not album_art_url:
-        print("Trying MusicBrainz + Cover Art Archive...")
-        album_art_url = search_album_art_musicbrainz(band_name, album_name)
-    if not album_art_url:
-        print("Using AcoustID fallback...")
-        album_info = recognize_with_acoustid(mp3_files[0])
-        if album_info:
-            fallback_query = f"{band_name} {album_info}"
-            album_art_url = search_album_art(fallback_query, expected_artist=band_name)
+    album_art_url = find_album_art(folder, band_name, first)
     if album_art_url:
-        art_data = download_image(album_art_url)
-        if art_data:
-            for mp3 in mp3_files:
-                embed_artwork(mp3, art_data, band_name)
-        else:
-            print("Could not download album art.")
-    else:
-        print("No album art found.")
+        artwork = fetch_artwork(album_art_url)
+        if artwork:
+            art_data, mime = artwork
+            digest = image_digest(art_data)
+            executor = executor or EmbedExecutor(workers=1)
+            for result in executor.embed_many(chain([first], pending), art_data, mime):
+                mp3 = result.path
+                if report(result) and state is not None:
+                    state.mark_done(mp3, digest)
+            return "embedded"
+        print("Could not download album art.")
+        return "download_failed"
+    print("No album art found.")
+    return "not_found"
+
+def find_album_art(folder, band_name, first_mp3):
+    """
+    Run the provider chain of an album folder.
+
+    Args:
+        folder (Path): Album folder; its cleaned name is the album searched for.
+        band_name (str): Band name used for artwork search.
+        first_mp3 (Path): A track of the album, used for AcoustID fingerprinting.
+
+    Returns:
+        str or None: Artwork URL, or None if no provider found one.
+    """
+    with metrics.timed("lookup"):
+        return lookup.find_artwork(lookup.album_providers(band_name, clean_album_name(folder.name), first_mp3),
+                                   scope=stats_scope(band_name, folder.parent))
 
-def process_all_folders(root_path, band_name, target_album=None):
-    """Process all subfolders for artwork embedding."""
+def fetch_artwork(url):
+    """
+    Download artwork and normalize it for embedding.
+
+    Returns:
+        tuple or None: (image bytes, MIME type), or None if the download failed.
+    """
+    art_data = download_image(url)
+    return normalize_image(art_data) if art_data else None
+
+def stats_scope(band_name, library_root):
+    """Scope of the provider statistics: the band if known, else the library folder."""
+    if band_name:
+        return "band:" + normalize_query(band_name)
+    return "library:" + str(Path(library_root).resolve())
+
+def _process_album(folder, band_name, state, index, executor, keep_going=False):
+    """
+    Run process_album_folder on an indexed album folder.
+
+    With keep_going, an unexpected error is printed and reported as the
+    "failed" outcome instead of being raised.
+    """
+    try:
+        return process_album_folder(folder, band_name, state=state,
+                                    mp3_files=index.album_tracks(folder), executor=executor)
+    except Exception as e:
+        if not keep_going:
+            raise
+        print(f"⚠️  Failed to process {folder.name}: {e}")
+        return "failed"
+
+def _process_album_buffered(folder, band_name, state, index, executor, keep_going=False):
+    """Run _process_album with its output captured instead of printed."""
+    with bind_output() as buffer:
+        status = _process_album(folder, band_name, state, index, executor, keep_going)
+    return status, buffer.getvalue()
+
+def _flush_oldest(pending, summary):
+    """Wait for the oldest in-flight album, print its output and count its outcome."""
+    status, output = pending.popleft().result()
+    print(output, end="")
+    summary[status] += 1
+
+def process_all_folders(root_path, band_name, target_album=None, jobs=1, force=False, rescan=False):
+    """
+    Process all subfolders for artwork embedding.
+
+    Args:
+        root_path (str or Path): Folder containing one subfolder per album.
+        band_name (str): Band name used for artwork search.
+        target_album (str, optional): Only process the album with this name.
+        jobs (int): Number of albums processed concurrently. With more than one
+            job, each album's output is buffered and printed in folder order.
+        force (bool): Reprocess files the state manifest reports as done.
+        rescan (bool): Re-list every directory when refreshing the library index.
+
+    Returns:
+        Counter: Number of albums per outcome (see process_album_folder).
+    """
     root = Path(root_path)
-    for folder in root.iterdir():
-        if folder.is_dir():
-            album_name = clean_album_name(folder.name)
-            if target_album and album_name.lower() != target_album.lower():
-                continue
-            process_album_folder(folder, band_name)
-
-def process_files_individually(root_path, band_name=None):
-    """Process individual MP3 files and try to embed artwork."""
+    index = LibraryIndex(root)
+    index.refresh(full=rescan)
+    state = StateManifest(root, force=force)
+    executor = EmbedExecutor()
+    try:
+        return _process_folders(index.album_folders(album=target_album), band_name, jobs, state, index, executor)
+    finally:
+        executor.close()
+        state.close()
+        index.close()
+
+def _process_folders(folders, band_name, jobs, state, index, executor, keep_going=False):
+    """
+    Run process_album_folder on each folder, jobs at a time, and count the outcomes.
+
+    With keep_going, an album that raises is reported and counted as
+    "failed" and the other albums carry on.
+    """
+    summary = Counter()
+    if jobs <= 1:
+        for folder in folders:
+            summary[_process_album(folder, band_name, state, index, executor, keep_going)] += 1
+        return summary
+
+    # Keep at most 2 * jobs albums in flight so a huge library is never
+    # queued up front, while workers stay busy behind a slow head album.
+    pending = deque()
+    with route_stdout(), ThreadPoolExecutor(max_workers=jobs) as pool:
+        for folder in folders:
+            pending.append(pool.submit(_process_album_buffered, folder, band_name, state, index, executor,
+                                       keep_going))
+            if len(pending) >= 2 * jobs:
+                _flush_oldest(pending, summary)
+        while pending:
+            _flush_oldest(pending, summary)
+    return summary
+
+def format_summary(summary):
+    """Render album outcome counts as "status=count, ..."."""
+    return ", ".join(f"{status}={count}" for status, count in sorted(summary.items()))
+
+def watch_library(root_path, band_name, jobs=1, force=False, rescan=False, polling=False,
+                  stop=None, after_batch=None):
+    """
+    Process the library, then keep processing album folders as they are added or changed.
+
+    The HTTP session, caches, library index and tag writers stay open for
+    the whole run. Folders are handed over by watcher.settled_folders once
+    they stop changing; only their directories are re-listed, and folders
+    whose tracks are all done in the state manifest (for instance after
+    this tool's own tag writes) are skipped silently. An album that fails
+    is reported and counted as "failed", and an error in a whole batch
+    (for instance a locked index) is reported; either way watching goes on.
+
+    Args:
+        root_path (str or Path): Folder containing one subfolder per album.
+        band_name (str): Band name used for artwork search.
+        jobs (int): Number of albums processed concurrently.
+        force (bool): Reprocess every file in the initial pass, ignoring the state manifest.
+        rescan (bool): Re-list every directory in the initial pass.
+        polling (bool): Poll for changes even if inotify is available.
+        stop (threading.Event, optional): Stop watching once this is set.
+        after_batch (callable, optional): Called with the Counter of outcomes
+            after the initial pass and after each batch of changed folders.
+    """
     root = Path(root_path)
-    mp3_files = list(root.glob("*.mp3"))
+    # Start watching before the initial pass so nothing added meanwhile is missed.
+    source = watcher.open_source(root, polling=polling)
+    index = LibraryIndex(root)
+    state = StateManifest(root, force=force)
+    executor = EmbedExecutor()
+    try:
+        try:
+            index.refresh(full=rescan)
+            summary = _process_folders(index.album_folders(), band_name, jobs, state, index, executor,
+                                       keep_going=True)
+            state.save()
+            if after_batch:
+                after_batch(summary)
+        except Exception as e:
+            print(f"⚠️  Initial pass stopped early: {e}")
+        # --force applies to the initial pass only; afterwards the manifest
+        # is what keeps the tool's own tag writes from being reprocessed.
+        state.force = False
+        print(f"\n👀 Watching {root} for new or changed albums (Ctrl+C to stop)...")
+        for folders in watcher.settled_folders(source, stop=stop):
+            try:
+                todo = []
+                for folder in folders:
+                    index.refresh_album(folder)
+                    tracks = index.album_tracks(folder)
+                    if folder.is_dir() and not (tracks and all(state.is_done(mp3) for mp3 in tracks)):
+                        todo.append(folder)
+                if not todo:
+                    continue
+                summary = _process_folders(todo, band_name, jobs, state, index, executor, keep_going=True)
+                state.save()
+                print(f"\nProcessed {len(todo)} changed folder(s): {format_summary(summary)}")
+                if after_batch:
+                    after_batch(summary)
+            except Exception as e:
+                names = ", ".join(folder.name for folder in folders)
+                print(f"⚠️  Could not process changed folder(s) {names}: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nStopped watching.")
+        source.close()
+        executor.close()
+        state.close()
+        index.close()
+
+def process_files_individually(root_path, band_name=None, force=False):
+    """
+    Process individual MP3 files and try to embed artwork.
+
+    Files recorded as done in the library's state manifest are skipped
+    unless force is set.
+    """
+    root = Path(root_path)
+    index = LibraryIndex(root)
+    index.refresh(recursive=False)
+    mp3_files = index.top_level_tracks()
     if not mp3_files:
         print("No MP3 files found at top level of music folder.")
+        index.close()
         return
+    state = StateManifest(root, force=force)
+    try:
+        with EmbedExecutor() as executor:
+            _process_files(mp3_files, band_name, state, executor,
+                           scope=stats_scope(band_name, root))
+    finally:
+        state.close()
+        index.close()
+
+def _finish_write(pending, state):
+    """Wait for the oldest queued write, report it and record it if it succeeded."""
+    futures, digest = pending.popleft()
+    for future in futures:
+        for result in future.result():
+            if report(result):
+                state.mark_done(result.path, digest)
+
+def _group_files(mp3_files, band_name):
+    """
+    Group files that belong to the same album so each album is searched once.
+
+    Files whose ID3 tag names an album are grouped by (artist, album);
+    the others by their file name, ignoring case, separators and a
+    leading track number.
+
+    Returns:
+        list of (str, str or None, list of Path): Search query, expected
+        artist and member files, in order of first appearance.
+    """
+    backend = registry.tag_backend()
+    groups = {}
+    for mp3 in mp3_files:
+        try:
+            tags = backend.load_tags(mp3)
+            artist, album = backend.tag_artist(tags), backend.tag_album(tags)
+        except Exception:
+            artist = album = ""
+        if album:
+            artist = band_name or artist
+            key = ("album", normalize_query(artist, album))
+            query = f"{artist} {album}" if artist else album
+        else:
+            stem = re.sub(r"^\d+\s*", "", " ".join(mp3.stem.replace('_', ' ').replace('-', ' ').split()))
+            key = ("stem", normalize_query(stem))
+            query = f"{band_name} {stem}" if band_name else stem
+        if key not in groups:
+            groups[key] = (query, band_name or artist or None, [])
+        groups[key][2].append(mp3)
+    return list(groups.values())
+
+def _process_files(mp3_files, band_name, state, executor, scope=None):
+    """
+    Resolve artwork once per album group, then download and embed it.
+
+    Groups go through an iTunes search on their name and a batched AcoustID
+    pass on a representative file each (followed by an iTunes search on the
+    recognized artist and title). The pass with the lower expected time to a
+    hit in scope runs first, and the other only handles its misses. Tag
+    writes are queued on the executor (at most 2 * workers at once) so they
+    overlap with the next download.
+    """
+    todo = []
     for mp3 in mp3_files:
-        base_name = mp3.stem.replace('_', ' ').replace('-', ' ')
-        search_query = f"{band_name} {base_name}" if band_name else base_name
-        print(f"Searching for artwork using: {search_query}")
-        album_art_url = search_album_art(search_query, expected_artist=band_name)
-        if not album_art_url:
-            print("Fallback to AcoustID fingerprinting...")
-            album_info = recognize_with_acoustid(mp3)
+        if state.is_done(mp3):
+            print(f"Skipping (unchanged since last run): {mp3.name}")
+        else:
+            todo.append(mp3)
+    groups = _group_files(todo, band_name)
+    search_album_art = registry.provider("itunes")
+    art_urls = dict.fromkeys(range(len(groups)))
+
+    def itunes_pass(group_ids):
+        for i in group_ids:
+            search_query, expected_artist, files = groups[i]
+            print(f"Searching for artwork using: {search_query} ({len(files)} file(s))")
+            started = time.monotonic()
+            art_urls[i] = search_album_art(search_query, expected_artist=expected_artist)
+            if scope is not None:
+                provider_stats.record(scope, "itunes", bool(art_urls[i]), time.monotonic() - started)
+
+    def acoustid_pass(group_ids):
+        print(f"AcoustID fingerprinting for {len(group_ids)} group(s)...")
+        representatives = {groups[i][2][0]: i for i in group_ids}
+        started = time.monotonic()
+        for mp3, album_info in registry.provider("acoustid_batch")(representatives).items():
             if album_info:
                 fallback_query = f"{band_name} {album_info}" if band_name else album_info
-                album_art_url = search_album_art(fallback_query)
+                art_urls[representatives[mp3]] = search_album_art(fallback_query)
+        if scope is not None:
+            # The batch is shared, so each group is charged an equal part of its time.
+            share = (time.monotonic() - started) / len(group_ids)
+            for i in group_ids:
+                provider_stats.record(scope, "acoustid", bool(art_urls[i]), share)
+
+    passes = {"itunes": itunes_pass, "acoustid": acoustid_pass}
+    for name in lookup.order_names(list(passes), scope):
+        remaining = [i for i in range(len(groups)) if not art_urls[i]]
+        if remaining:
+            passes[name](remaining)
+
+    pending = deque()
+    for i, (_, _, files) in enumerate(groups):
+        album_art_url = art_urls[i]
+        names = ", ".join(mp3.name for mp3 in files)
         if album_art_url:
             art_data = download_image(album_art_url)
             if art_data:
-                embed_artwork(mp3, art_data, band_name or "")
+                art_data, mime = normalize_image(art_data)
+                futures = executor.submit(files, art_data, mime)
+                pending.append((futures, image_digest(art_data)))
+                if executor.workers <= 1 or len(pending) >= 2 * executor.workers:
+                    _finish_write(pending, state)
             else:
-                print(f"Could not download image for {mp3.name}")
+                print(f"Could not download image for {names}")
         else:
-            print(f"No artwork found for {mp3.name}")
+            print(f"No artwork found for {names}")
+    while pending:
+        _finish_write(pending, state)
+
+def clean_album_art(root_path, album_title, rescan=False, dry_run=False, workers=None):
+    """
+    Remove embedded album artwork from folders whose album name contains album_title.
+
+    Files are scanned from their ID3 frame headers and cleaned in place on
+    a thread pool (see clean_engine); files without artwork are not written.
+
+    Args:
+        root_path (str or Path): Library root.
+        album_title (str): Case-insensitive part of the album folder names to clean.
+        rescan (bool): Re-list every directory when refreshing the library index.
+        dry_run (bool): Only count the files and bytes of artwork that would be removed.
+        workers (int, optional): Threads used; defaults to clean_engine.CLEAN_WORKERS.
 
-def clean_album_art(root_path, album_title):
-    """Remove embedded album artwork from matching folders."""
+    Returns:
+        Counter: Number of files per outcome (see clean_engine.CleanResult).
+    """
     root = Path(root_path)
-    normalized_target = album_title.lower().strip()
-    for folder in root.iterdir():
-        if folder.is_dir() and normalized_target in clean_album_name(folder.name).lower():
-            print(f"\n Cleaning artwork in album: {folder.name}")
-            mp3_files = list(folder.rglob("*.mp3"))
-            for mp3 in mp3_files:
-                try:
-                    audio = MP3(mp3, ID3=ID3)
-                    if audio.tags:
-                        audio.tags.delall("APIC")
-                        audio.save()
-                        print(f"Removed artwork: {mp3.name}")
-                    else:
-                        print(f"No tags found in: {mp3.name}")
-                except Exception as e:
-                    print(f"Failed to clean artwork in {mp3.name}: {e}")
+    index = LibraryIndex(root)
+    index.refresh(full=rescan)
+    totals, picture_bytes = Counter(), 0
+    try:
+        folders = index.album_folders(contains=album_title)
+        tracks = [(folder, mp3) for folder in folders for mp3 in index.album_tracks(folder)]
+        announced = None
+        results = clean_engine.clean_many((mp3 for _, mp3 in tracks), dry_run=dry_run, workers=workers)
+        for (folder, _), result in zip(tracks, results):
+            if folder != announced:
+                print(f"\n {'Scanning' if dry_run else 'Cleaning'} artwork in album: {folder.name}")
+                announced = folder
+            name = result.path.name
+            totals[result.status] += 1
+            picture_bytes += result.picture_bytes
+            if result.status == "removed":
+                print(f"Removed artwork: {name}")
+            elif result.status == "would_remove":
+                print(f"Would remove artwork: {name} ({result.pictures} picture(s), "
+                      f"{result.picture_bytes / 1024:.0f} KB)")
+            elif result.status == "no_artwork":
+                print(f"No artwork found in: {name}")
+            elif result.status == "no_tags":
+                print(f"No tags found in: {name}")
+            else:
+                print(f"Failed to clean artwork in {name}: {result.error}")
+    finally:
+        index.close()
+    files = sum(totals.values())
+    if dry_run:
+        print(f"\nDry run: {totals['would_remove']} of {files} file(s) carry artwork "
+              f"({picture_bytes / (1024 * 1024):.1f} MB); nothing was written.")
+    elif files:
+        print(f"\nRemoved artwork from {totals['removed']} of {files} file(s) "
+              f"({picture_bytes / (1024 * 1024):.1f} MB).")
+    return totals
 
 def download_cover_from_musicbrainz_id(release_id, folder_path):
     """Download artwork using MusicBrainz release ID."""
-    headers = {
-        "User-Agent": "MP3AlbumArtTool/1.0 (you@example.com)"
-    }
-    meta_url = f"https://coverartarchive.org/release/{release_id}"
+    meta_url = f"{musicbrainz_utils.COVERART_URL}/release/{release_id}"
     try:
-        meta_response = requests.get(meta_url, headers=headers, verify=False)
+        meta_response = http_client.get(meta_url, verify=False)
         if meta_response.status_code == 200:
             images = meta_response.json().get("images", [])
             image_url = next((img["image"] for img in images if img.get("front")), None)
@@ -156,23 +488,21 @@ def download_cover_from_musicbrainz_id(release_id, folder_path):
         image_url = None
 
     if not image_url:
-        image_url = f"https://coverartarchive.org/release/{release_id}/front-500"
+        image_url = f"{musicbrainz_utils.COVERART_URL}/release/{release_id}/front-500"
         print(f"Falling back to standard front-500 URL:\n{image_url}")
 
-    try:
-        response = requests.get(image_url, headers=headers, verify=False)
-        response.raise_for_status()
-        image_data = response.content
-    except Exception as e:
-        print(f"Failed to download artwork: {e}")
+    image_data = download_image(image_url)
+    if not image_data:
+        print("Failed to download artwork.")
         return
 
     folder = Path(folder_path)
-    mp3_files = list(folder.rglob("*.mp3"))
-    if not mp3_files:
+    image_data, mime = normalize_image(image_data)
+    print(f"Embedding artwork into files in {folder.name}...")
+    count = 0
+    for mp3 in iter_mp3_files(folder):
+        embed_artwork(mp3, image_data, mime=mime)
+        count += 1
+    if not count:
         print(f"No MP3 files found in {folder}")
-        return
-    print(f"Embedding artwork into {len(mp3_files)} files in {folder.name}...")
-    for mp3 in mp3_files:
-        embed_artwork(mp3, image_data, "")
 
@@ -0,0 +1,228 @@
+"""
+artwork_embedder.embed_executor
+Fan-out of per-file artwork writes to a process pool.
+
+Tag parsing, frame serialization and file rewrites are CPU-bound, so
+large albums and big ``--files`` directories are written from several
+processes. The image bytes are staged in a temporary file while writes
+of that image are queued, and each worker reads them at most once per
+image, so they are not pickled once per file. Results come back as EmbedResult
+records instead of printed lines.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from . import metrics, registry
+from .utils import image_digest
+
+# Processes used for tag writes; 1 writes in the calling thread.
+WRITE_WORKERS = 1
+# Files handed to a worker per task.
+CHUNK_SIZE = 8
+
+EmbedResult = namedtuple("EmbedResult", ["path", "status", "error", "seconds"], defaults=(None,))
+EmbedResult.__doc__ = """\
+Outcome of writing artwork to one file.
+
+status is "added", "replaced", "skipped" or "failed"; error holds the
+message for "failed" and is None otherwise. seconds is the time the
+write took in the process that did it.
+"""
+
+def configure(workers=None, chunk_size=None):
+    """
+    Set executor options.
+
+    Args:
+        workers (int, optional): Number of writer processes.
+        chunk_size (int, optional): Files per worker task.
+    """
+    global WRITE_WORKERS, CHUNK_SIZE
+    if workers is not None:
+        WRITE_WORKERS = max(1, workers)
+    if chunk_size is not None:
+        CHUNK_SIZE = max(1, chunk_size)
+
+def write_artwork(path, image_data, mime="image/jpeg", digest=None):
+    """
+    Embed artwork into one file without printing anything.
+
+    Files already carrying exactly this image are not written (see
+    tag_engine.embed_image).
+
+    Args:
+        path (Path): File to write.
+        image_data (bytes): Image content.
+        mime (str): MIME type of image_data.
+        digest (str, optional): image_digest(image_data), to avoid hashing it per file.
+
+    Returns:
+        EmbedResult: Outcome for path.
+    """
+    started = time.perf_counter()
+    try:
+        status, error = registry.tag_backend().embed_image(path, image_data, mime=mime, digest=digest), None
+    except Exception as e:
+        status, error = "failed", str(e)
+    return EmbedResult(path, status, error, time.perf_counter() - started)
+
+def report(result):
+    """
+    Print the usual message for an EmbedResult and record it in the metrics.
+
+    Returns:
+        bool: True if the file carries the artwork afterwards.
+    """
+    name = Path(result.path).name
+    metrics.incr("files_total", status=result.status)
+    if result.seconds is not None:
+        metrics.observe("stage_seconds", result.seconds, stage="tag_write")
+    if result.status == "failed":
+        print(f"Failed to embed artwork in {name}: {result.error}")
+        return False
+    if result.status == "skipped":
+        print(f"Skipping (same artwork already embedded): {name}")
+        return True
+    if result.status == "replaced":
+        print(f"Replacing different artwork in: {name}")
+    print(f"Embedded artwork: {name}")
+    return True
+
+# Worker-side copy of the most recently used staged image.
+_worker_image = (None, None)
+
+def _write_chunk(paths, image_path, mime):
+    """Worker entry point: write one staged image into a chunk of files."""
+    global _worker_image
+    if _worker_image[0] != image_path:
+        _worker_image = (image_path, Path(image_path).read_bytes())
+    image_data = _worker_image[1]
+    # Staged images are named by their digest.
+    digest = os.path.basename(image_path)
+    return [write_artwork(path, image_data, mime, digest) for path in paths]
+
+def _completed(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+class EmbedExecutor:
+    """
+    Writes artwork into many files, in a process pool when workers > 1.
+
+    Use as a context manager so the pool and staged images are cleaned up.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = WRITE_WORKERS if workers is None else workers
+        self._pool = None
+        self._stage_dir = None
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _stage(self, image_data, uses):
+        """
+        Write image_data to a temp file unless it is already staged and return its path.
+
+        The file is kept until uses more calls to _release for its digest
+        have been made, on top of those already pending.
+        """
+        digest = image_digest(image_data)
+        with self._lock:
+            if self._pool is None:
+                # Spawn rather than fork: callers may already run lookup threads.
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+                self._stage_dir = tempfile.mkdtemp(prefix="artwork-embedder-")
+            staged = self._staged.get(digest)
+            if staged is None:
+                path = os.path.join(self._stage_dir, digest)
+                with open(path, "wb") as f:
+                    f.write(image_data)
+                staged = self._staged[digest] = [path, 0]
+            staged[1] += uses
+            return staged[0]
+
+    def _release(self, digest):
+        """Drop one pending use of a staged image, deleting the file after the last."""
+        with self._lock:
+            staged = self._staged.get(digest)
+            if staged is None:
+                return
+            staged[1] -= 1
+            if staged[1] <= 0:
+                del self._staged[digest]
+                try:
+                    os.remove(staged[0])
+                except OSError:
+                    pass
+
+    def submit(self, paths, image_data, mime="image/jpeg"):
+        """
+        Schedule writes of one image into several files.
+
+        Args:
+            paths (iterable of Path): Files to write.
+            image_data (bytes): Image content.
+            mime (str): MIME type of image_data.
+
+        Returns:
+            list of Future: One per chunk, each resolving to a list of EmbedResult.
+        """
+        paths = list(paths)
+        if self.workers <= 1:
+            digest = image_digest(image_data)
+            return [_completed([write_artwork(path, image_data, mime, digest)]) for path in paths]
+        chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+        if not chunks:
+            return []
+        image_path = self._stage(image_data, len(chunks))
+        digest = os.path.basename(image_path)
+        futures = [self._pool.submit(_write_chunk, chunk, image_path, mime) for chunk in chunks]
+        # Outside the lock: a callback runs right away if its future is already done.
+        for future in futures:
+            future.add_done_callback(lambda _, digest=digest: self._release(digest))
+        return futures
+
+    def embed_many(self, paths, image_data, mime="image/jpeg"):
+        """
+        Write one image into several files.
+
+        With one worker, files are written lazily one at a time as paths
+        is consumed. Otherwise the writes are spread over the pool.
+
+        Yields:
+            EmbedResult: One per file, in the order of paths.
+        """
+        if self.workers <= 1:
+            digest = image_digest(image_data)
+            for path in paths:
+                yield write_artwork(path, image_data, mime, digest)
+            return
+        for future in self.submit(paths, image_data, mime):
+            yield from future.result()
+
+    def close(self):
+        """Shut down the pool and delete staged images."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            if self._stage_dir is not None:
+                shutil.rmtree(self._stage_dir, ignore_errors=True)
+                self._stage_dir = None
+            self._staged.clear()
@@ -0,0 +1,147 @@
+"""
+artwork_embedder.http_client
+Shared, pooled HTTP session used by every provider and image download.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import metrics, scheduler
+
+USER_AGENT = "MP3AlbumArtTool/1.0 (you@example.com)"
+
+# Defaults, overridable through configure()
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+POOL_SIZE = 10
+
+_session = None
+_lock = threading.Lock()
+
+def configure(connect_timeout=None, read_timeout=None, pool_size=None, user_agent=None):
+    """
+    Change the client settings. The shared session is rebuilt on next use.
+
+    Args:
+        connect_timeout (float, optional): Seconds to wait for a TCP/TLS connection.
+        read_timeout (float, optional): Seconds to wait between bytes of a response.
+        pool_size (int, optional): Maximum kept-alive connections per host.
+        user_agent (str, optional): User-Agent header sent with every request.
+    """
+    global CONNECT_TIMEOUT, READ_TIMEOUT, POOL_SIZE, USER_AGENT, _session
+    with _lock:
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if user_agent is not None:
+            USER_AGENT = user_agent
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_session():
+    """
+    Return the process-wide session, creating it on first use.
+
+    The session keeps connections alive in one pool per host, so repeated
+    calls to the same provider reuse the TCP/TLS connection.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            # Imported here so modes that never touch the network skip loading requests.
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            })
+            _session = session
+        return _session
+
+def get(url, **kwargs):
+    """
+    Send a GET request through the shared session.
+
+    Args:
+        url (str): URL to fetch.
+        **kwargs: Passed to ``requests.Session.get``. A ``(connect, read)``
+            timeout is applied unless one is given.
+
+    Returns:
+        requests.Response: The response.
+    """
+    return _request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    """
+    Send a POST request through the shared session.
+
+    Args:
+        url (str): URL to post to.
+        **kwargs: Passed to ``requests.Session.post``. A ``(connect, read)``
+            timeout is applied unless one is given.
+
+    Returns:
+        requests.Response: The response.
+    """
+    return _request("POST", url, **kwargs)
+
+def _request(method, url, **kwargs):
+    """
+    Send a request through the shared session and the host's scheduler.
+
+    The request waits for the host's rate limit, and a 429/503 answer is
+    retried up to scheduler.MAX_RETRIES times after the server's
+    Retry-After delay or a jittered backoff (either capped at
+    scheduler.BACKOFF_MAX). The last answer is returned
+    if every retry fails. Per-host metrics are recorded.
+    """
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    host = urlsplit(url).hostname or ""
+    bucket = scheduler.bucket_for(host)
+    attempt = 0
+    while True:
+        if bucket:
+            waited = bucket.acquire()
+            if waited:
+                metrics.incr("http_throttled_seconds_total", waited, host=host)
+        started = time.perf_counter()
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except Exception:
+            metrics.incr("http_errors_total", host=host)
+            raise
+        finally:
+            metrics.observe("http_request_seconds", time.perf_counter() - started, host=host)
+        metrics.incr("http_requests_total", host=host, status=response.status_code)
+        if response.status_code not in scheduler.RETRY_STATUSES or attempt >= scheduler.MAX_RETRIES:
+            break
+        delay = scheduler.retry_after(response)
+        if delay is None:
+            delay = scheduler.backoff_delay(attempt)
+        delay = min(delay, scheduler.BACKOFF_MAX)
+        response.close()
+        attempt += 1
+        metrics.incr("http_retries_total", host=host, status=response.status_code)
+        if bucket:
+            # Hold back every thread talking to this host, not just this one.
+            bucket.pause(delay)
+        else:
+            time.sleep(delay)
+    if not kwargs.get("stream"):
+        metrics.incr("http_bytes_total", len(response.content), host=host)
+    return response
@@ -0,0 +1,164 @@
+"""
+artwork_embedder.image_cache
+Content-addressed on-disk store for downloaded artwork.
+
+An index maps each URL to the SHA-256 digest of the bytes it returned,
+and each digest is stored once as a file under ``images/``. Identical
+images fetched from different URLs therefore share one blob. Blobs are
+evicted least-recently-used first once the store exceeds its byte cap.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from .utils import cache_dir, image_digest
+
+MAX_BYTES = 512 * 1024 * 1024
+
+class ImageCache:
+    """URL -> digest index plus digest -> bytes files, capped at max_bytes."""
+
+    def __init__(self, root, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = root / "images"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(root / "images.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY, digest TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " digest TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS blobs_by_access ON blobs (last_access);"
+        )
+        self._conn.commit()
+
+    def blob_path(self, digest):
+        """Return the file path holding the blob for digest."""
+        return self.blob_dir / digest[:2] / digest
+
+    def get(self, url):
+        """
+        Return the cached bytes for url, or None if not cached.
+
+        Args:
+            url (str): Image URL.
+
+        Returns:
+            bytes or None: Image content.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        digest = row[0]
+        try:
+            data = self.blob_path(digest).read_bytes()
+        except OSError:
+            self._forget(digest)
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            self._conn.commit()
+        return data
+
+    def put(self, url, data):
+        """
+        Store data as the content of url and return its digest.
+
+        Args:
+            url (str): Image URL the data was downloaded from.
+            data (bytes): Image content.
+
+        Returns:
+            str: SHA-256 hex digest of data.
+        """
+        digest = image_digest(data)
+        path = self.blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)", (url, digest))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (digest, size, last_access) VALUES (?, ?, ?)",
+                (digest, len(data), time.time()),
+            )
+            self._conn.commit()
+        self.evict()
+        return digest
+
+    def evict(self):
+        """Delete least-recently-used blobs until the store fits in max_bytes."""
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for digest, size in self._conn.execute("SELECT digest, size FROM blobs ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(digest)
+                total -= size
+        for digest in victims:
+            self._forget(digest)
+
+    def _forget(self, digest):
+        """Remove a blob and every URL pointing at it."""
+        try:
+            self.blob_path(digest).unlink()
+        except OSError:
+            pass
+        with self._lock:
+            self._conn.execute("DELETE FROM urls WHERE digest = ?", (digest,))
+            self._conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache = None
+_enabled = True
+_max_bytes = MAX_BYTES
+_cache_lock = threading.Lock()
+
+def configure(enabled=None, max_bytes=None):
+    """
+    Set image cache options for this process.
+
+    Args:
+        enabled (bool, optional): Turn the image cache on or off.
+        max_bytes (int, optional): Byte cap before least-recently-used blobs are evicted.
+    """
+    global _enabled, _max_bytes, _cache
+    with _cache_lock:
+        if enabled is not None:
+            _enabled = enabled
+        if max_bytes is not None:
+            _max_bytes = max_bytes
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+def get_cache():
+    """Return the shared ImageCache, or None when caching is disabled."""
+    global _cache, _enabled
+    with _cache_lock:
+        if not _enabled:
+            return None
+        if _cache is None:
+            try:
+                _cache = ImageCache(cache_dir(), max_bytes=_max_bytes)
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Image cache unavailable ({e}); continuing without it.")
+                _enabled = False
+                return None
+        return _cache
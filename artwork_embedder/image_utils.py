@@ -0,0 +1,189 @@
+"""
+artwork_embedder.image_utils
+Artwork preprocessing: MIME detection and per-album size normalization.
+
+Resizing and recompression need Pillow (``pip install Pillow``). Without
+it, images are embedded unchanged but still get a correct MIME type, and
+a warning is printed once if an image exceeds the limits.
+"""
+
+import io
+
+from . import metrics
+
+# Defaults, overridable through configure()
+MAX_DIMENSION = 1000
+JPEG_QUALITY = 90
+MAX_BYTES = 300 * 1024
+
+_MAGIC = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+# Set once the missing-Pillow warning has been printed.
+_warned_without_pillow = False
+
+def configure(max_dimension=None, jpeg_quality=None, max_bytes=None):
+    """
+    Set the normalization limits.
+
+    Args:
+        max_dimension (int, optional): Longest allowed side in pixels.
+        jpeg_quality (int, optional): JPEG quality (1-95) used when re-encoding.
+        max_bytes (int, optional): Byte budget for the embedded image.
+    """
+    global MAX_DIMENSION, JPEG_QUALITY, MAX_BYTES
+    if max_dimension is not None:
+        MAX_DIMENSION = max_dimension
+    if jpeg_quality is not None:
+        JPEG_QUALITY = jpeg_quality
+    if max_bytes is not None:
+        MAX_BYTES = max_bytes
+
+def detect_image_mime(data):
+    """
+    Detect an image's MIME type from its magic bytes.
+
+    Args:
+        data (bytes): Image content (the first few bytes are enough).
+
+    Returns:
+        str or None: MIME type such as "image/jpeg", or None if unrecognized.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, mime in _MAGIC:
+        if data.startswith(magic):
+            return mime
+    return None
+
+def image_dimensions(data):
+    """
+    Read an image's width and height from its header, without decoding it.
+
+    Args:
+        data (bytes): The start of the image (the first few KB are usually enough).
+
+    Returns:
+        tuple or None: (width, height), or None if the format is unknown or
+        the size is not within data.
+    """
+    mime = detect_image_mime(data)
+    if mime == "image/png" and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    if mime == "image/gif" and len(data) >= 10:
+        return int.from_bytes(data[6:8], "little"), int.from_bytes(data[8:10], "little")
+    if mime == "image/bmp" and len(data) >= 26:
+        return int.from_bytes(data[18:22], "little"), abs(int.from_bytes(data[22:26], "little", signed=True))
+    if mime == "image/webp" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8X":
+            return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8 ":
+            return int.from_bytes(data[26:28], "little") & 0x3FFF, int.from_bytes(data[28:30], "little") & 0x3FFF
+    if mime == "image/jpeg":
+        return _jpeg_dimensions(data)
+    return None
+
+def _jpeg_dimensions(data):
+    """Walk the JPEG marker segments up to the first start-of-frame."""
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = int.from_bytes(data[pos + 2:pos + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(data):
+                return None
+            return int.from_bytes(data[pos + 7:pos + 9], "big"), int.from_bytes(data[pos + 5:pos + 7], "big")
+        pos += 2 + length
+    return None
+
+def normalize_image(data):
+    """
+    Fit an image within the configured dimension and byte limits.
+
+    Images that are already JPEG or PNG and within limits are returned
+    untouched. Anything else is scaled down and re-encoded as JPEG, lowering
+    quality and then size until it fits the byte budget.
+
+    Args:
+        data (bytes): Downloaded image content.
+
+    Returns:
+        tuple: (bytes, mime) to embed.
+    """
+    with metrics.timed("normalize"):
+        return _normalize(data)
+
+def _warn_without_pillow(data, mime):
+    """Warn once that an image outside the limits is embedded as is because Pillow is missing."""
+    global _warned_without_pillow
+    if _warned_without_pillow:
+        return
+    size = image_dimensions(data)
+    problems = []
+    if size and max(size) > MAX_DIMENSION:
+        problems.append(f"{size[0]}x{size[1]} exceeds {MAX_DIMENSION} px")
+    if len(data) > MAX_BYTES:
+        problems.append(f"{len(data) // 1024} KB exceeds {MAX_BYTES // 1024} KB")
+    if mime not in ("image/jpeg", "image/png"):
+        problems.append(f"{mime} is not re-encoded as JPEG")
+    if problems:
+        _warned_without_pillow = True
+        print(f"⚠️  Pillow is not installed, so artwork is embedded as downloaded ({'; '.join(problems)}). "
+              "--max-art-size, --max-art-kb and --jpeg-quality need Pillow: pip install Pillow")
+
+def _normalize(data):
+    mime = detect_image_mime(data) or "image/jpeg"
+    try:
+        from PIL import Image
+    except ImportError:
+        _warn_without_pillow(data, mime)
+        return data, mime
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        print(f"⚠️  Could not decode artwork for normalization ({e}); embedding as downloaded.")
+        return data, mime
+
+    fits = max(image.size) <= MAX_DIMENSION and len(data) <= MAX_BYTES
+    if fits and mime in ("image/jpeg", "image/png"):
+        return data, mime
+
+    if image.mode != "RGB":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+
+    quality = JPEG_QUALITY
+    while True:
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=quality, optimize=True)
+        encoded = out.getvalue()
+        if len(encoded) <= MAX_BYTES or max(image.size) <= 100:
+            break
+        if quality > 60:
+            quality -= 10
+        else:
+            image = image.resize((max(1, image.width * 4 // 5), max(1, image.height * 4 // 5)), Image.LANCZOS)
+    print(f"Normalized artwork: {len(data) // 1024} KB -> {len(encoded) // 1024} KB, {image.width}x{image.height}")
+    return encoded, "image/jpeg"
@@ -3,7 +3,18 @@ artwork_embedder.itunes_utils
 Functions to search and retrieve album art from iTunes.
 """
 
-import requests
+import os
+from urllib.parse import quote
+
+from . import http_client, metrics
+from .lookup_cache import MISS, cached_lookup, normalize_query, store_lookup
+from .utils import SingleFlight
+
+# Base URL of the search API; overridable to point at a local stand-in.
+ITUNES_URL = os.getenv("ARTWORK_EMBEDDER_ITUNES_URL", "https://itunes.apple.com")
+
+# Searches currently running, so concurrent identical searches share one request.
+_inflight = SingleFlight()
 
 def search_album_art(query, expected_artist=None):
     """
@@ -16,14 +27,31 @@ def search_album_art(query, expected_artist=None):
     Returns:
         str or None: URL to a 600x600 image if found, else None.
     """
+    cache_key = normalize_query(query, expected_artist)
+    with metrics.timed("search", provider="itunes"):
+        url, shared = _inflight.do(cache_key, lambda: _search(query, expected_artist, cache_key))
+    if shared:
+        metrics.incr("lookups_total", provider="itunes", result="shared")
+        print(f"iTunes (shared): {'found artwork' if url else 'no artwork'} for '{query}'.")
+    return url
+
+def _search(query, expected_artist, cache_key):
+    cached = cached_lookup("itunes", cache_key)
+    if cached is not MISS:
+        metrics.incr("lookups_total", provider="itunes", result="cached")
+        print(f"iTunes (cached): {'found artwork' if cached else 'no artwork'} for '{query}'.")
+        return cached
+
     try:
-        url = f"https://itunes.apple.com/search?term={requests.utils.quote(query)}&media=music&entity=album&limit=10"
-        response = requests.get(url)
+        url = f"{ITUNES_URL}/search?term={quote(query)}&media=music&entity=album&limit=10"
+        response = http_client.get(url)
         response.raise_for_status()
         data = response.json()
 
         if data['resultCount'] == 0:
             print("No results found.")
+            metrics.incr("lookups_total", provider="itunes", result="miss")
+            store_lookup("itunes", cache_key, None)
             return None
 
         expected = expected_artist.lower() if expected_artist else None
@@ -32,12 +60,18 @@ def search_album_art(query, expected_artist=None):
             result_artist = result.get('artistName', '').lower()
             if expected and expected in result_artist:
                 print(f"Found album: {result['collectionName']} by {result['artistName']}")
-                return result['artworkUrl100'].replace('100x100bb', '600x600bb')
+                artwork_url = result['artworkUrl100'].replace('100x100bb', '600x600bb')
+                store_lookup("itunes", cache_key, artwork_url)
+                metrics.incr("lookups_total", provider="itunes", result="hit")
+                return artwork_url
 
         print(f"No album art found matching artist '{expected_artist}'.")
+        metrics.incr("lookups_total", provider="itunes", result="miss")
+        store_lookup("itunes", cache_key, None)
         return None
 
     except Exception as e:
         print(f"Failed to search album art: {e}")
+        metrics.incr("lookups_total", provider="itunes", result="error")
         return None
 
@@ -0,0 +1,271 @@
+"""
+artwork_embedder.library_index
+Persistent SQLite index of a music library's album folders and tracks.
+
+The index is built on ``walker.walk_dirs`` (``os.scandir``, with
+``--walk-workers`` directories checked in parallel) and refreshed
+incrementally: a directory is only re-listed when its mtime changed
+since the last scan. Only names and stat results are stored, so
+refreshing never opens a track. Modes then query the index instead of
+walking the tree.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from . import walker
+from .utils import cache_dir, clean_album_name
+
+INDEX_NAME = ".artwork_embedder_index.sqlite"
+# Bumped when the tables change; an older index is dropped and rebuilt.
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT NOT NULL,
+    album_key TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS folders_by_parent ON folders (parent);
+CREATE INDEX IF NOT EXISTS folders_by_album ON folders (album_key);
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    album_folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_by_folder ON tracks (folder);
+CREATE INDEX IF NOT EXISTS tracks_by_album ON tracks (album_folder);
+"""
+
+def album_key(folder_name):
+    """Return the normalized, lower-case album name used for lookups."""
+    return clean_album_name(folder_name).lower()
+
+class LibraryIndex:
+    """
+    Index of album folders (direct subfolders of the root) and their MP3 tracks.
+
+    Paths are stored relative to the library root, with "" for the root itself.
+    Hidden and symlinked folders are indexed like any other; a directory
+    reachable through several links is indexed under the first path found.
+    """
+
+    def __init__(self, root, db_path=None):
+        """
+        Args:
+            root (str or Path): Library root.
+            db_path (str or Path, optional): Index file. Defaults to a file in the
+                root, or in the cache directory if the root is not writable.
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._conn = self._connect(db_path)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS folders; DROP TABLE IF EXISTS tracks;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _connect(self, db_path):
+        if db_path is not None:
+            return sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        try:
+            conn = sqlite3.connect(str(self.root / INDEX_NAME), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA user_version")
+            return conn
+        except sqlite3.Error:
+            root_id = hashlib.sha256(str(self.root.resolve()).encode()).hexdigest()[:16]
+            fallback = cache_dir() / "indexes" / f"{root_id}.sqlite"
+            fallback.parent.mkdir(parents=True, exist_ok=True)
+            return sqlite3.connect(str(fallback), timeout=30, check_same_thread=False)
+
+    def _rel(self, path):
+        rel = os.path.relpath(path, self.root)
+        return "" if rel == "." else rel
+
+    def refresh(self, recursive=True, full=False, workers=None):
+        """
+        Bring the index up to date with the filesystem.
+
+        Args:
+            recursive (bool): Scan below the root. If False, only the root is listed:
+                its tracks and the names of its subfolders are indexed.
+            full (bool): Re-list every directory even if its mtime is unchanged.
+            workers (int, optional): Directories checked in parallel; defaults to
+                walker.WALK_WORKERS.
+
+        Returns:
+            int: Number of directories that were re-listed.
+        """
+        with self._lock:
+            rescanned = self._walk("", recursive, full, workers)
+            self._conn.commit()
+        return rescanned
+
+    def refresh_album(self, folder):
+        """
+        Re-list one album folder after it changed, without walking the rest of the library.
+
+        The root is refreshed non-recursively so new and removed folders are
+        noticed, then every directory below folder is re-listed. A folder
+        that no longer exists is dropped from the index.
+
+        Args:
+            folder (Path): Album folder (a direct subfolder of the root).
+
+        Returns:
+            int: Number of directories that were re-listed.
+        """
+        with self._lock:
+            rescanned = self._walk("", recursive=False, full=False)
+            rescanned += self._walk(self._rel(folder), recursive=True, full=True)
+            self._conn.commit()
+        return rescanned
+
+    def _walk(self, rel, recursive, full, workers=None):
+        """
+        Refresh rel, and the directories below it if recursive, on walker.walk_dirs.
+
+        Walker threads only stat and list directories; the rows are written
+        here, in the calling thread, as each directory's listing arrives.
+        """
+        start = os.path.join(self.root, rel)
+        if not os.path.isdir(start):
+            self._drop_folder(rel)
+            return 0
+        known = dict(self._conn.execute("SELECT path, mtime_ns FROM folders"))
+        children = {}
+        for path, parent in self._conn.execute("SELECT path, parent FROM folders WHERE parent IS NOT NULL"):
+            children.setdefault(parent, []).append(path)
+
+        def scan(path):
+            """Return ((rel, mtime_ns, tracks, subfolders, gone), subdirs to visit) for one directory."""
+            rel = self._rel(path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                return (rel, None, None, None, [rel]), []
+            if not full and known.get(rel) == mtime_ns:
+                # Unchanged: reuse the indexed subfolders instead of listing.
+                if not recursive:
+                    return (rel, mtime_ns, None, None, []), []
+                subs = children.get(rel, [])
+                gone = [sub for sub in subs if not os.path.isdir(os.path.join(self.root, sub))]
+                return (rel, mtime_ns, None, None, gone), [os.path.join(self.root, sub) for sub in subs]
+            tracks, subdirs = {}, []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            # Symlinked folders are followed; walk_dirs visits each
+                            # real directory once, so link loops terminate.
+                            if entry.is_dir():
+                                subdirs.append(entry.path)
+                            elif entry.name.lower().endswith(".mp3") and entry.is_file():
+                                st = entry.stat()
+                                tracks[self._rel(entry.path)] = (st.st_size, st.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError as e:
+                print(f"⚠️  Could not scan {path}: {e}")
+                return (rel, mtime_ns, None, None, []), []
+            listing = (rel, mtime_ns, tracks, [self._rel(sub) for sub in subdirs], [])
+            return listing, subdirs if recursive else []
+
+        rescanned = 0
+        for rel_dir, mtime_ns, tracks, subfolders, gone in walker.walk_dirs(start, scan, workers):
+            for folder in gone:
+                self._drop_folder(folder)
+            if tracks is not None:
+                self._sync_dir(rel_dir, mtime_ns, tracks, subfolders, record_subfolders=not recursive)
+                rescanned += 1
+        return rescanned
+
+    def _sync_dir(self, rel, mtime_ns, tracks, subfolders, record_subfolders):
+        """Write the track and subfolder rows of one freshly listed directory."""
+        album_folder = rel.split(os.sep, 1)[0]
+        known = {r[0]: (r[1], r[2]) for r in self._conn.execute(
+            "SELECT path, size, mtime_ns FROM tracks WHERE folder = ?", (rel,))}
+        for track, (size, track_mtime_ns) in tracks.items():
+            if known.get(track) == (size, track_mtime_ns):
+                continue
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tracks (path, folder, album_folder, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                (track, rel, album_folder, size, track_mtime_ns),
+            )
+        for track in known.keys() - tracks.keys():
+            self._conn.execute("DELETE FROM tracks WHERE path = ?", (track,))
+
+        known_dirs = {r[0] for r in self._conn.execute("SELECT path FROM folders WHERE parent = ?", (rel,))}
+        for gone in known_dirs - set(subfolders):
+            self._drop_folder(gone)
+        if record_subfolders:
+            # Record the folders so they can be found by name; mtime -1 makes
+            # the next recursive refresh list them.
+            for sub in subfolders:
+                name = os.path.basename(sub)
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO folders (path, parent, name, album_key, mtime_ns) VALUES (?, ?, ?, ?, -1)",
+                    (sub, rel, name, album_key(name)),
+                )
+
+        name = os.path.basename(rel)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO folders (path, parent, name, album_key, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            (rel, os.path.dirname(rel) if rel else None, name, album_key(name), mtime_ns),
+        )
+
+    def _drop_folder(self, rel):
+        """Remove a folder, its subfolders and their tracks from the index."""
+        for (child,) in self._conn.execute("SELECT path FROM folders WHERE parent = ?", (rel,)).fetchall():
+            self._drop_folder(child)
+        self._conn.execute("DELETE FROM tracks WHERE folder = ?", (rel,))
+        self._conn.execute("DELETE FROM folders WHERE path = ?", (rel,))
+
+    def album_folders(self, album=None, contains=None):
+        """
+        Return album folders (direct subfolders of the root), ordered by name.
+
+        Args:
+            album (str, optional): Only the folder whose cleaned name equals this, case-insensitively.
+            contains (str, optional): Only folders whose cleaned name contains this, case-insensitively.
+
+        Returns:
+            list of Path: Matching album folders.
+        """
+        query = "SELECT path FROM folders WHERE parent = ''"
+        params = []
+        if album is not None:
+            query += " AND album_key = ?"
+            params.append(album.lower().strip())
+        if contains is not None:
+            query += " AND instr(album_key, ?) > 0"
+            params.append(contains.lower().strip())
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY name", params).fetchall()
+        return [self.root / r[0] for r in rows]
+
+    def album_tracks(self, folder):
+        """Return every MP3 below an album folder, ordered by path."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM tracks WHERE album_folder = ? ORDER BY path", (self._rel(folder),)
+            ).fetchall()
+        return [self.root / r[0] for r in rows]
+
+    def top_level_tracks(self):
+        """Return the MP3 files directly in the library root, ordered by name."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM tracks WHERE folder = '' ORDER BY path").fetchall()
+        return [self.root / r[0] for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,184 @@
+"""
+artwork_embedder.lookup
+Provider chains for finding album artwork, run sequentially or hedged.
+
+Chains are ordered by the persisted provider statistics of the band or
+library (see provider_stats) unless an order is pinned with configure().
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import provider_stats, registry
+from .utils import bind_output, route_stdout
+
+# Seconds between starting successive providers in hedged mode. None keeps
+# the strict sequential fallback; 0 starts every provider at once.
+HEDGE_DELAY = None
+# Provider names in a fixed order, or None to order chains by their statistics.
+PROVIDER_ORDER = None
+
+def configure(hedge_delay=None, provider_order=None):
+    """
+    Choose how provider chains are run.
+
+    Args:
+        hedge_delay (float or None): None for sequential fallback, otherwise the
+            delay before each next provider is started alongside the previous ones.
+        provider_order (list of str, optional): Pin chains to these providers in
+            this order (others are skipped). None keeps the adaptive order.
+    """
+    global HEDGE_DELAY, PROVIDER_ORDER
+    HEDGE_DELAY = hedge_delay
+    PROVIDER_ORDER = list(provider_order) if provider_order else None
+
+def order_names(names, scope=None):
+    """
+    Order provider names for a band or library.
+
+    Args:
+        names (list of str): Provider names in default order.
+        scope (str, optional): Band or library whose statistics decide the order.
+
+    Returns:
+        list of str: The pinned order restricted to names, or names sorted by
+        expected time to a hit.
+    """
+    if PROVIDER_ORDER is not None:
+        return [name for name in PROVIDER_ORDER if name in names]
+    if scope is None:
+        return list(names)
+    return provider_stats.order(scope, names)
+
+def order_providers(providers, scope=None):
+    """Reorder (name, announcement, callable) providers with order_names."""
+    by_name = {provider[0]: provider for provider in providers}
+    return [by_name[name] for name in order_names(list(by_name), scope)]
+
+def album_providers(band_name, album_name, first_mp3):
+    """
+    Build the provider chain for an album folder, in priority order.
+
+    Args:
+        band_name (str): Band name.
+        album_name (str): Cleaned album name.
+        first_mp3 (Path): A track of the album, used for AcoustID fingerprinting.
+
+    Returns:
+        list of (str, str or None, callable): Provider name, announcement printed
+        before the provider runs (None for none) and a callable returning an
+        artwork URL or None.
+    """
+    def acoustid_then_itunes():
+        album_info = registry.provider("acoustid")(first_mp3)
+        if album_info:
+            return registry.provider("itunes")(f"{band_name} {album_info}", expected_artist=band_name)
+        return None
+
+    return [
+        ("itunes", None,
+         lambda: registry.provider("itunes")(f"{band_name} {album_name}", expected_artist=band_name)),
+        ("musicbrainz", "Trying MusicBrainz + Cover Art Archive...",
+         lambda: registry.provider("musicbrainz")(band_name, album_name)),
+        ("acoustid", "Using AcoustID fallback...", acoustid_then_itunes),
+    ]
+
+def find_artwork(providers, hedge_delay=None, scope=None):
+    """
+    Run a provider chain and return the URL from the highest-priority provider that has one.
+
+    Args:
+        providers (list): (name, announcement, callable) triples in default priority order.
+        hedge_delay (float, optional): Overrides the configured HEDGE_DELAY.
+        scope (str, optional): Band or library. When given, the chain is ordered
+            by its statistics and every provider attempt is recorded.
+
+    Returns:
+        str or None: Artwork URL, or None if no provider found one.
+    """
+    providers = order_providers(providers, scope)
+    if not providers:
+        return None
+    if scope is not None:
+        providers = [(name, announcement, _recorded(scope, name, provider))
+                     for name, announcement, provider in providers]
+    delay = HEDGE_DELAY if hedge_delay is None else hedge_delay
+    if delay is None:
+        for _, announcement, provider in providers:
+            if announcement:
+                print(announcement)
+            url = provider()
+            if url:
+                return url
+        return None
+    return _find_artwork_hedged(providers, delay)
+
+def _recorded(scope, name, provider):
+    """Wrap a provider so its outcome and latency are recorded in provider_stats."""
+    def run():
+        started = time.monotonic()
+        url = provider()
+        provider_stats.record(scope, name, bool(url), time.monotonic() - started)
+        return url
+    return run
+
+def _run_buffered(provider):
+    """
+    Run a provider with its output captured, returning (url, output).
+
+    Each run holds the stdout routing until it finishes, so a provider that
+    is abandoned once a result has been chosen keeps writing into its own
+    (discarded) buffer instead of the terminal.
+    """
+    with route_stdout(), bind_output() as buffer:
+        url = provider()
+    return url, buffer.getvalue()
+
+def _find_artwork_hedged(providers, delay):
+    """
+    Start provider i after i * delay seconds, or as soon as every earlier provider missed.
+
+    A result is only accepted once every higher-priority provider has
+    answered, so the chosen URL is the one the sequential chain would pick.
+    Providers still running at that point are ignored and not yet started
+    ones are never launched. Output of the consulted providers is printed
+    in priority order.
+    """
+    pool = ThreadPoolExecutor(max_workers=len(providers))
+    futures = []
+    started = time.monotonic()
+    try:
+        while True:
+            # Launch providers that are due, or the next one if all earlier ones missed.
+            elapsed = time.monotonic() - started
+            while len(futures) < len(providers) and (
+                elapsed >= len(futures) * delay or all(f.done() for f in futures)
+            ):
+                futures.append(pool.submit(_run_buffered, providers[len(futures)][2]))
+
+            # Walk the chain in priority order until a result is still pending.
+            for index, future in enumerate(futures):
+                if not future.done():
+                    break
+                url, output = future.result()
+                if url:
+                    _print_consulted(providers, futures[:index + 1])
+                    return url
+            else:
+                if len(futures) == len(providers):
+                    _print_consulted(providers, futures)
+                    return None
+
+            running = [f for f in futures if not f.done()]
+            next_start = started + len(futures) * delay
+            timeout = max(next_start - time.monotonic(), 0) if len(futures) < len(providers) else None
+            wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _print_consulted(providers, futures):
+    """Replay the output of finished providers in priority order."""
+    for (_, announcement, _), future in zip(providers, futures):
+        if announcement:
+            print(announcement)
+        print(future.result()[1], end="")
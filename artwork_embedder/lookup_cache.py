@@ -0,0 +1,149 @@
+"""
+artwork_embedder.lookup_cache
+Persistent on-disk cache of artwork search results, including "not found" answers.
+"""
+
+import sqlite3
+import threading
+import time
+
+from .utils import cache_dir
+
+# Resolved URLs are kept for 30 days, "not found" answers for 3 days so
+# albums that gain artwork upstream are retried reasonably soon.
+POSITIVE_TTL = 30 * 24 * 3600
+NEGATIVE_TTL = 3 * 24 * 3600
+MAX_ENTRIES = 100_000
+
+# Returned by LookupCache.get when the cache has no usable entry.
+MISS = object()
+
+def normalize_query(*parts):
+    """
+    Build a cache key from query parts, ignoring case and extra whitespace.
+
+    Args:
+        *parts (str or None): Query components such as band and album name.
+
+    Returns:
+        str: Normalized key, with parts separated by "|".
+    """
+    return "|".join(" ".join((part or "").lower().split()) for part in parts)
+
+class LookupCache:
+    """SQLite-backed map of (provider, query) to an artwork URL or a negative marker."""
+
+    def __init__(self, path, refresh=False):
+        self.path = path
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " provider TEXT NOT NULL, query TEXT NOT NULL, url TEXT, stored_at REAL NOT NULL,"
+            " PRIMARY KEY (provider, query))"
+        )
+        self._conn.commit()
+        self.prune()
+
+    def get(self, provider, query):
+        """
+        Return the cached URL (or None for a cached miss), or MISS if absent or expired.
+
+        Args:
+            provider (str): Provider name, e.g. "itunes".
+            query (str): Normalized query (see normalize_query).
+        """
+        if self.refresh:
+            return MISS
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, stored_at FROM lookups WHERE provider = ? AND query = ?",
+                (provider, query),
+            ).fetchone()
+        if row is None:
+            return MISS
+        url, stored_at = row
+        ttl = POSITIVE_TTL if url else NEGATIVE_TTL
+        if time.time() - stored_at > ttl:
+            return MISS
+        return url
+
+    def put(self, provider, query, url):
+        """Store a resolved URL, or None to record that nothing was found."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lookups (provider, query, url, stored_at) VALUES (?, ?, ?, ?)",
+                (provider, query, url, time.time()),
+            )
+            self._conn.commit()
+
+    def prune(self, max_entries=None):
+        """Drop expired entries, then the oldest ones beyond max_entries."""
+        max_entries = MAX_ENTRIES if max_entries is None else max_entries
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM lookups WHERE (url IS NOT NULL AND stored_at < ?)"
+                " OR (url IS NULL AND stored_at < ?)",
+                (now - POSITIVE_TTL, now - NEGATIVE_TTL),
+            )
+            self._conn.execute(
+                "DELETE FROM lookups WHERE rowid IN ("
+                " SELECT rowid FROM lookups ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache = None
+_enabled = True
+_refresh = False
+_cache_lock = threading.Lock()
+
+def configure(enabled=None, refresh=None):
+    """
+    Set cache options for this process.
+
+    Args:
+        enabled (bool, optional): Turn the lookup cache on or off.
+        refresh (bool, optional): Ignore cached answers but still store new ones.
+    """
+    global _enabled, _refresh, _cache
+    with _cache_lock:
+        if enabled is not None:
+            _enabled = enabled
+        if refresh is not None:
+            _refresh = refresh
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+def get_cache():
+    """Return the shared LookupCache, or None when caching is disabled."""
+    global _cache, _enabled
+    with _cache_lock:
+        if not _enabled:
+            return None
+        if _cache is None:
+            try:
+                _cache = LookupCache(cache_dir() / "lookups.sqlite", refresh=_refresh)
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Lookup cache unavailable ({e}); continuing without it.")
+                _enabled = False
+                return None
+        return _cache
+
+def cached_lookup(provider, query):
+    """Shortcut for get_cache().get(...) that returns MISS when caching is disabled."""
+    cache = get_cache()
+    return cache.get(provider, query) if cache else MISS
+
+def store_lookup(provider, query, url):
+    """Shortcut for get_cache().put(...) that does nothing when caching is disabled."""
+    cache = get_cache()
+    if cache:
+        cache.put(provider, query, url)
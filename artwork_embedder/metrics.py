@@ -0,0 +1,178 @@
+"""
+artwork_embedder.metrics
+In-process counters and latency histograms for each stage and provider.
+
+Stages (search, download, normalize, fingerprint, tag_write, clean) are
+timed with ``timed``; providers and the HTTP client count requests,
+hits, misses, bytes and retries with ``incr``. A run's metrics can be
+written as JSON lines or a Prometheus textfile, or printed as a
+per-stage breakdown.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIX = "artwork_embedder_"
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def incr(name, value=1, **labels):
+    """
+    Add value to a counter.
+
+    Args:
+        name (str): Counter name, e.g. "lookups_total".
+        value (int or float): Amount to add.
+        **labels: Label values identifying the series, e.g. provider="itunes".
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    """
+    Record one duration in a histogram.
+
+    Args:
+        name (str): Histogram name, e.g. "stage_seconds".
+        seconds (float): Observed duration.
+        **labels: Label values identifying the series.
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+        histogram["buckets"][bisect_left(BUCKETS, seconds)] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+@contextmanager
+def timed(stage, **labels):
+    """Time the enclosed block as one observation of stage_seconds for stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+def reset():
+    """Forget every recorded value."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def snapshot():
+    """
+    Return a copy of the recorded metrics.
+
+    Returns:
+        tuple: (counters, histograms), dicts keyed by (name, sorted label pairs).
+    """
+    with _lock:
+        return dict(_counters), {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                                 for key, h in _histograms.items()}
+
+def to_json_lines():
+    """Render every series as one JSON object per line."""
+    counters, histograms = snapshot()
+    now = time.time()
+    lines = []
+    for (name, labels), value in sorted(counters.items()):
+        lines.append({"time": now, "type": "counter", "name": name, "labels": dict(labels), "value": value})
+    for (name, labels), h in sorted(histograms.items()):
+        cumulative, buckets = 0, {}
+        for bound, count in zip(BUCKETS + (float("inf"),), h["buckets"]):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        lines.append({"time": now, "type": "histogram", "name": name, "labels": dict(labels),
+                      "count": h["count"], "sum": round(h["sum"], 6), "buckets": buckets})
+    return "".join(json.dumps(line) + "\n" for line in lines)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def to_prometheus():
+    """Render every series in the Prometheus text exposition format."""
+    counters, histograms = snapshot()
+    lines, typed = [], set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            typed.add(name)
+        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+    for (name, labels), h in sorted(histograms.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), h["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else str(bound)
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {h['sum']:.6f}")
+        lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+def write(path):
+    """
+    Write the recorded metrics to path.
+
+    A path ending in ".prom" gets a Prometheus textfile (replaced
+    atomically, as node_exporter expects); anything else gets JSON lines
+    appended, so successive runs accumulate in one file.
+
+    Args:
+        path (str or Path): Output file.
+    """
+    path = str(path)
+    if path.endswith(".prom"):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(to_prometheus())
+        os.replace(tmp, path)
+    else:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(to_json_lines())
+
+def print_profile():
+    """Print time spent per stage and the request/hit counts per provider."""
+    counters, histograms = snapshot()
+    stages = sorted(((dict(labels), h) for (name, labels), h in histograms.items() if name == "stage_seconds"),
+                    key=lambda item: -item[1]["sum"])
+    print("\n⏱️  Profile by stage:")
+    if not stages:
+        print("  (no timed stages)")
+    for labels, h in stages:
+        stage = labels.pop("stage")
+        detail = f" [{', '.join(f'{k}={v}' for k, v in sorted(labels.items()))}]" if labels else ""
+        average = h["sum"] / h["count"] * 1000 if h["count"] else 0.0
+        print(f"  {stage + detail:<32} {h['count']:>7} x {average:>9.1f} ms = {h['sum']:>9.2f} s")
+
+    grouped = {}
+    for (name, labels), value in counters.items():
+        labels = dict(labels)
+        owner = labels.pop("provider", None) or labels.pop("host", None) or "-"
+        detail = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        grouped.setdefault(owner, []).append((f"{name}{'{' + detail + '}' if detail else ''}", value))
+    if grouped:
+        print("📊 Counters:")
+        for owner in sorted(grouped):
+            values = ", ".join(f"{name}={value:g}" for name, value in sorted(grouped[owner]))
+            print(f"  {owner}: {values}")
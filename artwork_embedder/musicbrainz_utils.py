@@ -3,16 +3,71 @@ artwork_embedder.musicbrainz_utils
 Functions to query MusicBrainz and Cover Art Archive for album artwork.
 """
 
-import requests
-import musicbrainzngs
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from . import http_client, metrics
+from .lookup_cache import MISS, cached_lookup, normalize_query, store_lookup
+
+# Service base URLs; overridable to point at local stand-ins.
+MUSICBRAINZ_URL = os.getenv("ARTWORK_EMBEDDER_MUSICBRAINZ_URL", "https://musicbrainz.org")
+COVERART_URL = os.getenv("ARTWORK_EMBEDDER_COVERART_URL", "https://coverartarchive.org")
+
+# Number of Cover Art Archive probes in flight at once.
+CAA_FANOUT = 4
+# Probe the top release group's cover (which covers all of its pressings)
+# before the individual releases.
+PREFER_RELEASE_GROUP = False
+
+def configure(fanout=None, prefer_release_group=None):
+    """
+    Set Cover Art Archive probing options.
+
+    Args:
+        fanout (int, optional): Concurrent CAA metadata requests per album.
+        prefer_release_group (bool, optional): Try release-group cover art first.
+    """
+    global CAA_FANOUT, PREFER_RELEASE_GROUP
+    if fanout is not None:
+        CAA_FANOUT = max(1, fanout)
+    if prefer_release_group is not None:
+        PREFER_RELEASE_GROUP = prefer_release_group
+
+def _probe_cover_art(entity, mbid):
+    """
+    Check whether Cover Art Archive has a front image for a release or release group.
+
+    Args:
+        entity (str): "release" or "release-group".
+        mbid (str): MusicBrainz ID.
+
+    Returns:
+        tuple: ("front", None), ("none", None) for a definite miss, or
+        ("error", message) when the probe could not get an answer.
+    """
+    with metrics.timed("caa_probe"):
+        try:
+            art_resp = http_client.get(f"{COVERART_URL}/{entity}/{mbid}", verify=False)
+            if art_resp.status_code == 200:
+                images = art_resp.json().get("images", [])
+                result = ("front", None) if any(img.get("front") for img in images) else ("none", None)
+            elif art_resp.status_code == 404:
+                result = "none", None
+            else:
+                result = "error", f"HTTP {art_resp.status_code}"
+        except Exception as e:
+            result = "error", str(e)
+    metrics.incr("caa_probes_total", provider="coverartarchive", result=result[0])
+    return result
 
-# Configure MusicBrainz API user-agent
-musicbrainzngs.set_useragent("MP3AlbumArtTool", "1.0", "your-email@example.com")
 
 def search_album_art_musicbrainz(band_name, album_name):
     """
     Query MusicBrainz for album releases and retrieve album art from Cover Art Archive.
 
+    Up to CAA_FANOUT releases are probed concurrently; the first release in
+    MusicBrainz rank order that has a front image wins.
+
     Args:
         band_name (str): Artist/band name.
         album_name (str): Album title.
@@ -20,53 +75,95 @@ def search_album_art_musicbrainz(band_name, album_name):
     Returns:
         str or None: URL to the front album cover if found, else None.
     """
-    headers = {
-        "User-Agent": "MP3AlbumArtTool/1.0 (you@example.com)"
-    }
+    with metrics.timed("search", provider="musicbrainz"):
+        return _search(band_name, album_name)
+
+def _search(band_name, album_name):
+    cache_key = normalize_query(band_name, album_name)
+    cached = cached_lookup("musicbrainz", cache_key)
+    if cached is not MISS:
+        metrics.incr("lookups_total", provider="musicbrainz", result="cached")
+        print(f"MusicBrainz (cached): {'found artwork' if cached else 'no artwork'} for '{band_name} - {album_name}'.")
+        return cached
 
     query_url = (
-        f"https://musicbrainz.org/ws/2/release/?query=release:\"{album_name}\"%20AND%20artist:\"{band_name}\""
+        f"{MUSICBRAINZ_URL}/ws/2/release/?query=release:\"{album_name}\"%20AND%20artist:\"{band_name}\""
         "&fmt=json&limit=20"
     )
 
     try:
-        response = requests.get(query_url, headers=headers, verify=False)
+        response = http_client.get(query_url, verify=False)
         if response.status_code != 200:
             print(f"Failed to query MusicBrainz: {response.status_code}")
+            metrics.incr("lookups_total", provider="musicbrainz", result="error")
             return None
 
         releases = response.json().get("releases", [])
         if not releases:
             print("MusicBrainz: No matching releases found.")
+            metrics.incr("lookups_total", provider="musicbrainz", result="miss")
+            store_lookup("musicbrainz", cache_key, None)
             return None
 
         print(f"MusicBrainz returned {len(releases)} possible releases.")
 
-        for release in releases:
-            release_id = release.get("id")
-            title = release.get("title", "Unknown Title")
-            date = release.get("date", "Unknown Date")
-            artist_credit = release.get("artist-credit", [])
-            artist = artist_credit[0]["name"] if artist_credit else band_name
-
-            cover_meta_url = f"https://coverartarchive.org/release/{release_id}"
-            try:
-                art_resp = requests.get(cover_meta_url, headers=headers, verify=False)
-                if art_resp.status_code == 200:
-                    images = art_resp.json().get("images", [])
-                    for img in images:
-                        if img.get("front"):
-                            print(f"Found artwork for release: {title} by {artist} ({date})")
-                            return f"https://coverartarchive.org/release/{release_id}/front-500"
-                else:
-                    print(f"No artwork metadata for: {title} ({release_id})")
-            except Exception as e:
-                print(f"Error checking artwork for {release_id}: {e}")
+        if PREFER_RELEASE_GROUP:
+            group_id = next((r["release-group"]["id"] for r in releases if r.get("release-group", {}).get("id")), None)
+            if group_id and _probe_cover_art("release-group", group_id)[0] == "front":
+                print(f"Found release-group artwork for: {releases[0].get('title', album_name)}")
+                artwork_url = f"{COVERART_URL}/release-group/{group_id}/front-500"
+                metrics.incr("lookups_total", provider="musicbrainz", result="hit")
+                store_lookup("musicbrainz", cache_key, artwork_url)
+                return artwork_url
+
+        artwork_url, probe_failed = _probe_releases(releases, band_name)
+        if artwork_url:
+            store_lookup("musicbrainz", cache_key, artwork_url)
+            metrics.incr("lookups_total", provider="musicbrainz", result="hit")
+            return artwork_url
 
         print("No releases with valid artwork found.")
+        metrics.incr("lookups_total", provider="musicbrainz", result="miss")
+        # A probe that errored says nothing about the release, so the
+        # overall miss is only cached when every probe got an answer.
+        if not probe_failed:
+            store_lookup("musicbrainz", cache_key, None)
         return None
 
     except Exception as e:
         print(f"MusicBrainz query failed: {e}")
+        metrics.incr("lookups_total", provider="musicbrainz", result="error")
         return None
 
+def _probe_releases(releases, band_name):
+    """
+    Probe releases concurrently and pick the first with a front image, in rank order.
+
+    Returns:
+        tuple: (artwork URL or None, True if any probe failed before a hit).
+    """
+    probe_failed = False
+    pool = ThreadPoolExecutor(max_workers=CAA_FANOUT)
+    try:
+        futures = [pool.submit(_probe_cover_art, "release", release.get("id")) for release in releases]
+        for release, future in zip(releases, futures):
+            release_id = release.get("id")
+            title = release.get("title", "Unknown Title")
+            status, error = future.result()
+            if status == "front":
+                date = release.get("date", "Unknown Date")
+                artist_credit = release.get("artist-credit", [])
+                artist = artist_credit[0]["name"] if artist_credit else band_name
+                print(f"Found artwork for release: {title} by {artist} ({date})")
+                return f"{COVERART_URL}/release/{release_id}/front-500", probe_failed
+            if status == "error":
+                print(f"Error checking artwork for {release_id}: {error}")
+                probe_failed = True
+            else:
+                print(f"No artwork metadata for: {title} ({release_id})")
+    finally:
+        # Lower-ranked probes are irrelevant once a result is chosen: drop
+        # the queued ones and let running ones (and their retries) finish
+        # in the background instead of waiting for them.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return None, probe_failed
@@ -0,0 +1,157 @@
+"""
+artwork_embedder.provider_stats
+Persistent hit rate and latency of each artwork provider, per band or library.
+
+Lookup chains record every provider attempt here and are reordered so the
+provider with the lowest expected time to a hit (mean latency divided by
+hit rate) is asked first. A catalog where iTunes rarely has the album thus
+starts with MusicBrainz after a few albums.
+"""
+
+import sqlite3
+import threading
+
+from .utils import cache_dir
+
+# Smoothing for providers with few attempts: one virtual hit in two
+# attempts, and one virtual attempt taking PRIOR_LATENCY seconds.
+PRIOR_LATENCY = 1.0
+# Once a provider has this many attempts in a scope, its counts are halved
+# so the statistics follow changes in the catalog.
+WINDOW = 200
+
+class ProviderStats:
+    """SQLite-backed (scope, provider) -> attempts, hits and total seconds, cached in memory."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS provider_stats ("
+            " scope TEXT NOT NULL, provider TEXT NOT NULL, attempts REAL NOT NULL,"
+            " hits REAL NOT NULL, seconds REAL NOT NULL, PRIMARY KEY (scope, provider))"
+        )
+        self._conn.commit()
+
+    def _load(self, scope):
+        stats = self._memory.get(scope)
+        if stats is None:
+            rows = self._conn.execute(
+                "SELECT provider, attempts, hits, seconds FROM provider_stats WHERE scope = ?", (scope,)
+            ).fetchall()
+            stats = self._memory[scope] = {provider: list(values) for provider, *values in rows}
+        return stats
+
+    def get(self, scope):
+        """
+        Return the statistics of a scope.
+
+        Returns:
+            dict: Provider name -> (attempts, hits, seconds).
+        """
+        with self._lock:
+            return {provider: tuple(values) for provider, values in self._load(scope).items()}
+
+    def record(self, scope, provider, hit, seconds):
+        """
+        Add one provider attempt to a scope.
+
+        Args:
+            scope (str): Band or library the attempt belongs to.
+            provider (str): Provider name.
+            hit (bool): Whether the provider found artwork.
+            seconds (float): Time the attempt took.
+        """
+        with self._lock:
+            values = self._load(scope).setdefault(provider, [0.0, 0.0, 0.0])
+            values[0] += 1
+            values[1] += 1 if hit else 0
+            values[2] += seconds
+            if values[0] >= WINDOW:
+                values[:] = [v / 2 for v in values]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO provider_stats (scope, provider, attempts, hits, seconds)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (scope, provider, *values),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def expected_cost(attempts, hits, seconds):
+    """
+    Expected seconds spent per hit for a provider.
+
+    Args:
+        attempts (float): Recorded attempts.
+        hits (float): Attempts that found artwork.
+        seconds (float): Total time of the attempts.
+
+    Returns:
+        float: Smoothed mean latency divided by smoothed hit rate.
+    """
+    hit_rate = (hits + 1) / (attempts + 2)
+    latency = (seconds + PRIOR_LATENCY) / (attempts + 1)
+    return latency / hit_rate
+
+_stats = None
+_enabled = True
+_stats_lock = threading.Lock()
+
+def configure(enabled=None):
+    """
+    Turn recording and adaptive ordering on or off.
+
+    Args:
+        enabled (bool, optional): Use the persisted statistics.
+    """
+    global _enabled, _stats
+    with _stats_lock:
+        if enabled is not None:
+            _enabled = enabled
+        if _stats is not None:
+            _stats.close()
+            _stats = None
+
+def get_stats():
+    """Return the shared ProviderStats, or None when disabled or unavailable."""
+    global _stats, _enabled
+    with _stats_lock:
+        if not _enabled:
+            return None
+        if _stats is None:
+            try:
+                _stats = ProviderStats(cache_dir() / "provider_stats.sqlite")
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️  Provider statistics unavailable ({e}); using the default order.")
+                _enabled = False
+                return None
+        return _stats
+
+def record(scope, provider, hit, seconds):
+    """Shortcut for get_stats().record(...) that does nothing when disabled."""
+    stats = get_stats()
+    if stats:
+        stats.record(scope, provider, hit, seconds)
+
+def order(scope, names):
+    """
+    Sort provider names by expected time to a hit in scope, cheapest first.
+
+    Ties (e.g. providers without statistics) keep their given order.
+
+    Args:
+        scope (str): Band or library.
+        names (list of str): Provider names in default order.
+
+    Returns:
+        list of str: The names, reordered.
+    """
+    stats = get_stats()
+    if not stats:
+        return list(names)
+    known = stats.get(scope)
+    return sorted(names, key=lambda name: expected_cost(*known.get(name, (0, 0, 0))))
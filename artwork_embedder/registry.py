@@ -0,0 +1,76 @@
+"""
+artwork_embedder.registry
+Lazily loaded artwork providers and tag backends.
+
+Entries name a module and an attribute ("package.module:function"). The
+module is imported the first time the entry is used, so each mode only
+loads the providers and backends it actually calls; ``--clean-album``,
+for instance, never imports the HTTP stack.
+"""
+
+import importlib
+
+PROVIDERS = {
+    "itunes": "artwork_embedder.itunes_utils:search_album_art",
+    "musicbrainz": "artwork_embedder.musicbrainz_utils:search_album_art_musicbrainz",
+    "acoustid": "artwork_embedder.acoustid_utils:recognize_with_acoustid",
+    "acoustid_batch": "artwork_embedder.acoustid_utils:recognize_many_with_acoustid",
+}
+TAG_BACKENDS = {
+    "id3": "artwork_embedder.tag_engine",
+}
+DEFAULT_TAG_BACKEND = "id3"
+
+def _resolve(target):
+    module_name, _, attribute = target.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute) if attribute else module
+
+def register_provider(name, target):
+    """
+    Add or replace a provider.
+
+    Args:
+        name (str): Provider name used by lookup chains.
+        target (str or callable): "module:function" to import on first use, or the callable itself.
+    """
+    PROVIDERS[name] = target
+
+def provider(name):
+    """
+    Return a provider's callable, importing its module if needed.
+
+    Args:
+        name (str): Registered provider name, e.g. "itunes".
+
+    Returns:
+        callable: The provider function.
+    """
+    target = PROVIDERS[name]
+    return _resolve(target) if isinstance(target, str) else target
+
+def register_tag_backend(name, target):
+    """
+    Add or replace a tag backend.
+
+    Args:
+        name (str): Backend name.
+        target (str or module): Module path to import on first use, or the module itself.
+    """
+    TAG_BACKENDS[name] = target
+
+def tag_backend(name=None):
+    """
+    Return a tag backend module, importing it if needed.
+
+    A backend provides load_tags, tag_artist, tag_album, embed_image and
+    strip_artwork with the signatures of artwork_embedder.tag_engine.
+
+    Args:
+        name (str, optional): Registered backend name; defaults to DEFAULT_TAG_BACKEND.
+
+    Returns:
+        module: The backend.
+    """
+    target = TAG_BACKENDS[name or DEFAULT_TAG_BACKEND]
+    return _resolve(target) if isinstance(target, str) else target
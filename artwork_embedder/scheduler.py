@@ -0,0 +1,164 @@
+"""
+artwork_embedder.scheduler
+Per-host request scheduling: token-bucket rate limits and backoff on 429/503.
+
+Every request made through http_client waits for a token from its host's
+bucket, so concurrent album jobs share one budget per service. A 429 or
+503 answer pauses the whole host for the Retry-After time it names, or a
+jittered exponential backoff when it names none, before the request is
+retried.
+"""
+
+import random
+import threading
+import time
+
+# Requests per second and burst size per host. Hosts not listed (and
+# their subdomains) are not rate limited.
+RATE_LIMITS = {
+    "musicbrainz.org": (1.0, 1),
+    "coverartarchive.org": (5.0, 10),
+    "itunes.apple.com": (20 / 60, 10),
+    "api.acoustid.org": (3.0, 3),
+}
+# Retries of a request answered with one of RETRY_STATUSES.
+MAX_RETRIES = 4
+RETRY_STATUSES = (429, 503)
+# First backoff delay and upper bound, in seconds.
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+class TokenBucket:
+    """
+    Token bucket that callers block on until they may send a request.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Bucket capacity.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        # Time up to which tokens have been credited; after a pause it lies
+        # in the future, so no tokens accumulate before the pause ends.
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def _reserve(self):
+        """Take a token (possibly one not yet earned) and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            deficit = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(0.0, self._updated - now) + deficit
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """
+        Hold back every caller for at least seconds, e.g. after a Retry-After answer.
+
+        One request may go out when the pause ends; later ones are spaced
+        at the bucket's rate from there, so callers queued during the pause
+        do not all fire at once.
+        """
+        with self._lock:
+            now = time.monotonic()
+            until = now + seconds
+            if until <= self._updated:
+                return
+            self._refill(now)
+            # Drop any burst and keep reservations already handed out.
+            self._tokens = min(self._tokens, 0.0) + 1.0
+            self._updated = until
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def configure(rate_limits=None, max_retries=None, backoff_base=None, backoff_max=None):
+    """
+    Set scheduling options. Existing buckets are rebuilt on next use.
+
+    Args:
+        rate_limits (dict, optional): Host -> (requests per second, burst), merged
+            into RATE_LIMITS. A rate of 0 or less removes the host's limit.
+        max_retries (int, optional): Retries after a 429/503 answer.
+        backoff_base (float, optional): First backoff delay in seconds.
+        backoff_max (float, optional): Longest backoff delay in seconds.
+    """
+    global MAX_RETRIES, BACKOFF_BASE, BACKOFF_MAX
+    with _buckets_lock:
+        for host, (rate, burst) in (rate_limits or {}).items():
+            if rate > 0:
+                RATE_LIMITS[host] = (rate, burst)
+            else:
+                RATE_LIMITS.pop(host, None)
+        _buckets.clear()
+    if max_retries is not None:
+        MAX_RETRIES = max(0, max_retries)
+    if backoff_base is not None:
+        BACKOFF_BASE = backoff_base
+    if backoff_max is not None:
+        BACKOFF_MAX = backoff_max
+
+def bucket_for(host):
+    """
+    Return the shared TokenBucket for host, or None if it is not rate limited.
+
+    A limit set for "example.org" also applies to "www.example.org".
+    """
+    with _buckets_lock:
+        if host in _buckets:
+            return _buckets[host]
+        limit = None
+        parts = host.split(".")
+        for i in range(len(parts)):
+            limit = RATE_LIMITS.get(".".join(parts[i:]))
+            if limit:
+                break
+        _buckets[host] = TokenBucket(*limit) if limit else None
+        return _buckets[host]
+
+def retry_after(response):
+    """
+    Read the Retry-After header of a response.
+
+    Returns:
+        float or None: Seconds to wait, or None if the header is absent or invalid.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    """Jittered exponential backoff for a retry: half the capped delay plus a random half."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
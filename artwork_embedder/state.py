@@ -0,0 +1,152 @@
+"""
+artwork_embedder.state
+Per-library manifest of files that already carry their artwork, for incremental runs.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .utils import cache_dir
+
+MANIFEST_NAME = ".artwork_embedder_state.sqlite"
+# JSON manifest written by earlier versions; imported once, then removed.
+LEGACY_MANIFEST_NAME = ".artwork_embedder_state.json"
+LEGACY_MANIFEST_VERSION = 1
+
+# Commit after this many updates or seconds, whichever comes first, so an
+# interrupted run loses at most a little progress. Only the changed rows
+# are written, so the cost of a commit does not grow with the library.
+SAVE_EVERY = 50
+SAVE_INTERVAL = 10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT
+);
+"""
+
+class StateManifest:
+    """
+    Records path, size, mtime and applied artwork digest of every completed file.
+
+    A file whose size and mtime still match its record is considered done
+    and can be skipped without opening it. Records live in a SQLite file in
+    the library root, or in the cache directory if the root is not writable.
+    """
+
+    def __init__(self, root, force=False):
+        """
+        Args:
+            root (str or Path): Library root; the manifest is stored there.
+            force (bool): Treat every file as pending, while still recording progress.
+        """
+        self.root = Path(root)
+        self.force = force
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._last_save = time.monotonic()
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._import_legacy()
+
+    def _connect(self):
+        self.path = self.root / MANIFEST_NAME
+        try:
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA user_version")
+            return conn
+        except sqlite3.Error:
+            root_id = hashlib.sha256(str(self.root.resolve()).encode()).hexdigest()[:16]
+            self.path = cache_dir() / "state" / f"{root_id}.sqlite"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            return sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+
+    def _import_legacy(self):
+        """Move the records of an earlier JSON manifest into the database."""
+        legacy = self.root / LEGACY_MANIFEST_NAME
+        try:
+            with open(legacy, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable state manifest {legacy}: {e}")
+            return
+        if data.get("version") == LEGACY_MANIFEST_VERSION:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                ((path, r["size"], r["mtime_ns"], r.get("digest")) for path, r in data.get("files", {}).items()),
+            )
+            self._conn.commit()
+        try:
+            os.remove(legacy)
+        except OSError:
+            pass
+
+    def _key(self, path):
+        return os.path.relpath(path, self.root)
+
+    def is_done(self, path):
+        """Return True if path was completed earlier and has not changed since."""
+        if self.force:
+            return False
+        with self._lock:
+            record = self._conn.execute(
+                "SELECT size, mtime_ns FROM files WHERE path = ?", (self._key(path),)
+            ).fetchone()
+        if record is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return record == (st.st_size, st.st_mtime_ns)
+
+    def mark_done(self, path, digest):
+        """
+        Record path as completed with the artwork identified by digest.
+
+        Args:
+            path (Path): File that now carries its artwork.
+            digest (str): Digest of the embedded image (see utils.image_digest).
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (self._key(path), st.st_size, st.st_mtime_ns, digest),
+            )
+            self._dirty += 1
+            due = self._dirty >= SAVE_EVERY or time.monotonic() - self._last_save >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        """Commit the records added since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = 0
+            self._last_save = time.monotonic()
+            try:
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not write state manifest {self.path}: {e}")
+
+    def close(self):
+        """Commit pending records and close the database."""
+        self.save()
+        with self._lock:
+            self._conn.close()
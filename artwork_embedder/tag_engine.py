@@ -0,0 +1,91 @@
+"""
+artwork_embedder.tag_engine
+Single-parse ID3 tag engine for reading, embedding and removing artwork.
+
+Only the ID3 tag region of a file is parsed (no MPEG frame scan), and
+writes reuse the tag's existing padding whenever the new tag fits, so
+the audio payload is not rewritten.
+"""
+
+from mutagen.id3 import ID3, APIC, ID3NoHeaderError
+
+from .utils import image_digest
+
+def load_tags(path):
+    """
+    Parse the ID3 tag of a file.
+
+    Args:
+        path (Path): Path to the MP3 file.
+
+    Returns:
+        ID3: The parsed tag, or an empty one if the file has no ID3 header.
+    """
+    try:
+        return ID3(path)
+    except ID3NoHeaderError:
+        return ID3()
+
+def _keep_padding(info):
+    """Reuse existing padding when the new tag fits, otherwise use mutagen's default."""
+    return info.padding if info.padding >= 0 else info.get_default_padding()
+
+def save_tags(tags, path):
+    """Write tags to path, rewriting the file only if the tag outgrows its padding."""
+    tags.save(path, padding=_keep_padding)
+
+def tag_artist(tags):
+    """Return the lead artist (TPE1) of a parsed tag, or an empty string."""
+    frame = tags.get("TPE1")
+    return " ".join(str(text) for text in frame.text) if frame else ""
+
+def tag_album(tags):
+    """Return the album title (TALB) of a parsed tag, or an empty string."""
+    frame = tags.get("TALB")
+    return " ".join(str(text) for text in frame.text) if frame else ""
+
+def embed_image(path, image_data, mime="image/jpeg", digest=None):
+    """
+    Embed image_data as the front cover of path, unless it is already embedded.
+
+    The file is left unwritten when its only picture has the same digest
+    as image_data; any other artwork is replaced.
+
+    Args:
+        path (Path): Path to the MP3 file.
+        image_data (bytes): Image content.
+        mime (str): MIME type of image_data.
+        digest (str, optional): image_digest(image_data), if already known.
+
+    Returns:
+        str: "skipped", "replaced" or "added".
+    """
+    tags = load_tags(path)
+    pictures = tags.getall("APIC")
+    has_art = bool(pictures)
+    if len(pictures) == 1 and image_digest(pictures[0].data) == (digest or image_digest(image_data)):
+        return "skipped"
+    tags.delall("APIC")
+    tags.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=image_data))
+    save_tags(tags, path)
+    return "replaced" if has_art else "added"
+
+def strip_artwork(path):
+    """
+    Remove every embedded picture from path, writing only if there was one.
+
+    Args:
+        path (Path): Path to the MP3 file.
+
+    Returns:
+        str: "removed", "no_artwork" or "no_tags".
+    """
+    try:
+        tags = ID3(path)
+    except ID3NoHeaderError:
+        return "no_tags"
+    if not tags.getall("APIC"):
+        return "no_artwork"
+    tags.delall("APIC")
+    save_tags(tags, path)
+    return "removed"
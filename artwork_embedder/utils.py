@@ -3,8 +3,111 @@ artwork_embedder.utils
 Common utility functions shared across modules.
 """
 
+import hashlib
+import io
+import os
 import re
-import requests
+import sys
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import http_client, metrics
+from .image_utils import detect_image_mime, image_dimensions
+
+_output = threading.local()
+# Active route_stdout blocks and the stream they replaced.
+_routing_lock = threading.Lock()
+_routing_depth = 0
+_routed_from = None
+_cache_dir = None
+
+# Download limits, overridable through configure(). Larger images are
+# rejected before they are read completely.
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+MAX_SOURCE_DIMENSION = 10000
+# Bytes read before the payload is checked, and the streaming read size.
+HEADER_BYTES = 64 * 1024
+CHUNK_BYTES = 64 * 1024
+
+class DownloadRejected(Exception):
+    """Raised when a download is not an acceptable image."""
+
+class _RoutedStdout:
+    """Stdout proxy that sends writes to the calling thread's bound buffer, if any."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buffer = getattr(_output, "buffer", None)
+        return (buffer or self._stream).write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while
+    it is still running wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the call already in flight.
+
+        Args:
+            key (hashable): Identifies equivalent calls.
+            fn (callable): Function producing the value.
+
+        Returns:
+            tuple: (value, shared), where shared is True if the value came
+            from another caller's execution.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+_downloads = SingleFlight()
+
+def configure(max_download_bytes=None, max_source_dimension=None):
+    """
+    Set image download limits.
+
+    Args:
+        max_download_bytes (int, optional): Largest accepted image in bytes.
+        max_source_dimension (int, optional): Largest accepted width or height in pixels.
+    """
+    global MAX_DOWNLOAD_BYTES, MAX_SOURCE_DIMENSION
+    if max_download_bytes is not None:
+        MAX_DOWNLOAD_BYTES = max_download_bytes
+    if max_source_dimension is not None:
+        MAX_SOURCE_DIMENSION = max_source_dimension
 
 def clean_album_name(folder_name):
     """
@@ -24,9 +127,45 @@ def clean_album_name(folder_name):
     # Strip and normalize whitespace
     return name.strip()
 
+def set_cache_dir(path):
+    """Override the directory used for on-disk caches (see cache_dir)."""
+    global _cache_dir
+    _cache_dir = Path(path) if path else None
+
+def cache_dir():
+    """
+    Return the directory holding on-disk caches, creating it if needed.
+
+    Uses the directory given to set_cache_dir, else $ARTWORK_EMBEDDER_CACHE_DIR,
+    else ~/.cache/artwork-embedder.
+
+    Returns:
+        Path: Cache directory.
+    """
+    path = _cache_dir or Path(os.getenv("ARTWORK_EMBEDDER_CACHE_DIR") or Path.home() / ".cache" / "artwork-embedder")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def image_digest(data):
+    """
+    Return the SHA-256 hex digest identifying an image's content.
+
+    Args:
+        data (bytes): Image content.
+
+    Returns:
+        str: Hex digest.
+    """
+    return hashlib.sha256(data).hexdigest()
+
 def download_image(url):
     """
-    Download an image from a URL.
+    Download an image from a URL, serving repeats from the on-disk image cache.
+
+    Concurrent downloads of the same URL share one request. The body is
+    streamed, and the download is abandoned as soon as it exceeds
+    MAX_DOWNLOAD_BYTES or its first bytes are not an image no larger than
+    MAX_SOURCE_DIMENSION on either side.
 
     Args:
         url (str): URL to download image from.
@@ -34,11 +173,119 @@ def download_image(url):
     Returns:
         bytes or None: Image content if successful, else None.
     """
+    return _downloads.do(url, lambda: _download_image(url))[0]
+
+def _download_image(url):
+    from . import image_cache
+
+    cache = image_cache.get_cache()
+    if cache:
+        cached = cache.get(url)
+        if cached is not None:
+            metrics.incr("image_cache_total", result="hit")
+            return cached
+        metrics.incr("image_cache_total", result="miss")
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.content
+        with metrics.timed("download"):
+            data = _fetch_image(url)
+    except DownloadRejected as e:
+        metrics.incr("downloads_total", result="rejected")
+        print(f"⚠️  Download rejected: {e} ({url})")
+        return None
     except Exception as e:
+        metrics.incr("downloads_total", result="error")
         print(f"Download failed: {e}")
         return None
+    metrics.incr("downloads_total", result="ok")
+    metrics.incr("download_bytes_total", len(data))
+    if cache:
+        try:
+            cache.put(url, data)
+        except Exception as e:
+            print(f"⚠️  Could not cache image: {e}")
+    return data
+
+def _fetch_image(url):
+    """Stream url into memory, validating it on the way."""
+    with http_client.get(url, stream=True) as response:
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > MAX_DOWNLOAD_BYTES:
+            raise DownloadRejected(f"{int(length) // 1024} KB exceeds the {MAX_DOWNLOAD_BYTES // 1024} KB limit")
+
+        with io.BytesIO() as buffer:
+            header, size, checked = b"", 0, False
+            for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_DOWNLOAD_BYTES:
+                    raise DownloadRejected(f"body exceeds the {MAX_DOWNLOAD_BYTES // 1024} KB limit")
+                if not checked:
+                    header += chunk
+                    if len(header) < HEADER_BYTES:
+                        continue
+                    _check_header(header)
+                    buffer.write(header)
+                    checked = True
+                else:
+                    buffer.write(chunk)
+            if not checked:
+                _check_header(header)
+                buffer.write(header)
+            return buffer.getvalue()
+
+def _check_header(header):
+    """Reject a download whose first bytes are not an image of acceptable size."""
+    if detect_image_mime(header) is None:
+        preview = header[:40].decode("latin-1", "replace").strip()
+        raise DownloadRejected(f"not an image (starts with {preview!r})")
+    size = image_dimensions(header)
+    if size and max(size) > MAX_SOURCE_DIMENSION:
+        raise DownloadRejected(f"{size[0]}x{size[1]} exceeds {MAX_SOURCE_DIMENSION} px")
+
+@contextmanager
+def route_stdout():
+    """
+    Install a thread-aware stdout proxy for the duration of the block.
+
+    While active, ``print`` calls made from a thread with a bound buffer
+    (see ``bind_output``) are collected in that buffer instead of being
+    written to the terminal, so concurrent workers do not interleave.
+    Blocks may overlap (e.g. several async library runs); the proxy stays
+    installed until the last of them ends.
+    """
+    global _routing_depth, _routed_from
+    with _routing_lock:
+        if _routing_depth == 0 and not isinstance(sys.stdout, _RoutedStdout):
+            _routed_from = sys.stdout
+            sys.stdout = _RoutedStdout(_routed_from)
+        _routing_depth += 1
+    try:
+        yield
+    finally:
+        with _routing_lock:
+            _routing_depth -= 1
+            if _routing_depth == 0 and _routed_from is not None:
+                sys.stdout = _routed_from
+                _routed_from = None
+
+@contextmanager
+def bind_output(buffer=None):
+    """
+    Collect this thread's ``print`` output in a buffer.
+
+    Args:
+        buffer (io.StringIO, optional): Buffer to write into. A new one is created if omitted.
+
+    Yields:
+        io.StringIO: The buffer bound to the current thread.
+    """
+    previous = getattr(_output, "buffer", None)
+    _output.buffer = buffer if buffer is not None else io.StringIO()
+    try:
+        yield _output.buffer
+    finally:
+        _output.buffer = previous
 
+def current_output():
+    """Return the buffer bound to the current thread, or None when printing directly."""
+    return getattr(_output, "buffer", None)
@@ -0,0 +1,145 @@
+"""
+artwork_embedder.walker
+Streaming directory walker built on ``os.scandir``.
+
+Files are yielded as soon as they are found, so callers can start
+working before a deep tree (or a slow network share) has been fully
+listed, and no full path list is kept in memory. ``walk_dirs`` is the
+underlying traversal, shared with the library index.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Directories listed concurrently; 1 walks depth-first in the calling thread.
+WALK_WORKERS = 1
+
+def configure(workers=None):
+    """
+    Set walker options.
+
+    Args:
+        workers (int, optional): Number of sibling directories listed in parallel.
+    """
+    global WALK_WORKERS
+    if workers is not None:
+        WALK_WORKERS = max(1, workers)
+
+def walk_dirs(root, scan, workers=None):
+    """
+    Visit root and the directories below it, each real directory once.
+
+    Directories are identified by device and inode, so symlink loops
+    terminate and a directory reachable through several links is only
+    visited through the first one found.
+
+    Args:
+        root (str or Path): Directory to start from.
+        scan (callable): Called with the path (str) of each directory and
+            returns (result, subdirs), where subdirs are the directory paths
+            to visit next. Runs on worker threads when workers > 1.
+        workers (int, optional): Directories scanned in parallel; defaults
+            to WALK_WORKERS.
+
+    Yields:
+        The result of each visited directory; in no particular order with
+        more than one worker.
+    """
+    workers = WALK_WORKERS if workers is None else workers
+    visited = set()
+    visited_lock = threading.Lock()
+
+    def first_visit(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        key = (st.st_dev, st.st_ino)
+        with visited_lock:
+            if key in visited:
+                return False
+            visited.add(key)
+            return True
+
+    def visit(path):
+        result, subdirs = scan(path)
+        return result, [subdir for subdir in subdirs if first_visit(subdir)]
+
+    if not first_visit(root):
+        return
+    if workers <= 1:
+        yield from _walk_serial(str(root), visit)
+    else:
+        yield from _walk_parallel(str(root), visit, workers)
+
+def iter_files(root, extensions=(".mp3",), recursive=True, follow_symlinks=True, workers=None):
+    """
+    Yield files below root whose extension matches, case-insensitively.
+
+    Args:
+        root (str or Path): Directory to walk.
+        extensions (tuple of str): Accepted extensions, e.g. (".mp3",).
+        recursive (bool): Descend into subdirectories.
+        follow_symlinks (bool): Follow symlinked directories. Each real directory
+            is visited once, so symlink loops terminate.
+        workers (int, optional): Directories listed in parallel; defaults to
+            WALK_WORKERS. With more than one worker, files arrive in no
+            particular order.
+
+    Yields:
+        Path: Matching files.
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+
+    def scan(path):
+        """List one directory, returning (matching files, subdirectories)."""
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if recursive:
+                                subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(extensions) and entry.is_file():
+                            files.append(Path(entry.path))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"⚠️  Could not scan {path}: {e}")
+        return files, subdirs
+
+    for files in walk_dirs(root, scan, workers):
+        yield from files
+
+def _walk_serial(root, visit):
+    stack = [root]
+    while stack:
+        result, subdirs = visit(stack.pop())
+        yield result
+        # Reverse so subdirectories are visited in listing order.
+        stack.extend(reversed(subdirs))
+
+def _walk_parallel(root, visit, workers):
+    results = queue.Queue()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(path):
+            pool.submit(visit, path).add_done_callback(results.put)
+
+        outstanding = 1
+        submit(root)
+        while outstanding:
+            future = results.get()
+            outstanding -= 1
+            result, subdirs = future.result()
+            for subdir in subdirs:
+                submit(subdir)
+                outstanding += 1
+            yield result
+
+def iter_mp3_files(folder, recursive=True):
+    """Yield the MP3 files below folder (any case of the extension)."""
+    return iter_files(folder, extensions=(".mp3",), recursive=recursive)
@@ -0,0 +1,382 @@
+"""
+artwork_embedder.watcher
+Detection of new or changed album folders for the long-running watch mode.
+
+On Linux the library tree is watched with inotify (through ctypes, so no
+extra package is needed); elsewhere, or when inotify is unavailable or
+out of watches, the tree is polled: each poll only stats directories and
+re-lists those whose mtime changed, and only folders waiting to settle
+have their files stat'ed. A folder is handed out once it has not changed
+for the debounce time, so albums that are still being copied are not
+processed half-way. Folders are picked up by the same rules as the library
+index: hidden and symlinked folders count, and each real directory is
+watched once, so symlink loops terminate.
+"""
+
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from .library_index import INDEX_NAME
+from .state import LEGACY_MANIFEST_NAME, MANIFEST_NAME
+
+# Seconds a folder must stay unchanged before it is processed.
+DEBOUNCE_SECONDS = 10.0
+# Seconds between two scans of the library when polling.
+POLL_INTERVAL = 5.0
+# Longest single wait, so a stop request is noticed promptly.
+MAX_WAIT = 1.0
+
+# inotify(7) constants.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE | _IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+# The tool's own files in the library root (with SQLite's -journal, -wal
+# and -shm companions); changes to them are not library changes.
+_OWN_FILES = (INDEX_NAME, MANIFEST_NAME, LEGACY_MANIFEST_NAME)
+
+def configure(debounce=None, poll_interval=None):
+    """
+    Set watcher options.
+
+    Args:
+        debounce (float, optional): Seconds a folder must stay unchanged before it is processed.
+        poll_interval (float, optional): Seconds between scans when polling.
+    """
+    global DEBOUNCE_SECONDS, POLL_INTERVAL
+    if debounce is not None:
+        DEBOUNCE_SECONDS = max(0.0, debounce)
+    if poll_interval is not None:
+        POLL_INTERVAL = max(0.1, poll_interval)
+
+def _subdirs(path):
+    """Return the names of the subdirectories of path, including symlinked ones."""
+    names = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    names.append(entry.name)
+            except OSError:
+                continue
+    return names
+
+def _dir_key(path):
+    """Return (device, inode) of a directory, following symlinks, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+def _album_of(rel):
+    return rel.split(os.sep, 1)[0]
+
+def _sleep(seconds, stop):
+    if seconds > 0:
+        if stop is not None:
+            stop.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+class PollingSource:
+    """
+    Finds changed album folders by periodically comparing directory mtimes.
+
+    Directories are only re-listed when their mtime changed. Folders that
+    are waiting to settle also get their files' sizes and mtimes compared,
+    since a file that is still being written does not touch its directory.
+    """
+
+    def __init__(self, root, interval=None):
+        self.root = Path(root)
+        self.interval = POLL_INTERVAL if interval is None else interval
+        self._dirs = {}
+        self._signatures = {}
+        self._scan("", set(), set())
+        self._last_scan = time.monotonic()
+
+    def _scan(self, rel, changed, seen):
+        """Stat rel and its known subdirectories, re-listing those that changed."""
+        path = os.path.join(self.root, rel)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget(rel, changed)
+            return
+        if (st.st_dev, st.st_ino) in seen:
+            return  # Already scanned through another link, or a symlink loop.
+        seen.add((st.st_dev, st.st_ino))
+        mtime_ns = st.st_mtime_ns
+        known = self._dirs.get(rel)
+        if known is not None and known[0] == mtime_ns:
+            subdirs = known[1]
+        else:
+            try:
+                subdirs = [os.path.join(rel, name) if rel else name for name in _subdirs(path)]
+            except OSError:
+                subdirs = []
+            if known is not None:
+                for gone in set(known[1]) - set(subdirs):
+                    self._forget(gone, changed)
+            self._dirs[rel] = (mtime_ns, subdirs)
+            if rel:
+                changed.add(_album_of(rel))
+        for sub in subdirs:
+            self._scan(sub, changed, seen)
+
+    def _forget(self, rel, changed):
+        for path in [p for p in self._dirs if p == rel or p.startswith(rel + os.sep)]:
+            del self._dirs[path]
+        if rel:
+            changed.add(_album_of(rel))
+
+    def _signature(self, album):
+        """Sizes and mtimes of every file below an album folder."""
+        entries, seen = [], set()
+        for dirpath, dirnames, filenames in os.walk(self.root / album, followlinks=True):
+            key = _dir_key(dirpath)
+            if key is None or key in seen:
+                dirnames[:] = []
+                continue
+            seen.add(key)
+            for name in filenames:
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                entries.append((dirpath, name, st.st_size, st.st_mtime_ns))
+        return sorted(entries)
+
+    def wait(self, timeout, pending, stop=None):
+        """
+        Wait up to timeout seconds and return the album folder names that changed.
+
+        Args:
+            timeout (float): Longest time to block.
+            pending (set of str): Folders waiting to settle; their files are compared too.
+            stop (threading.Event, optional): Ends the wait early when set.
+
+        Returns:
+            set of str: Names of changed album folders.
+        """
+        remaining = self._last_scan + self.interval - time.monotonic()
+        if remaining > timeout:
+            _sleep(timeout, stop)
+            return set()
+        _sleep(remaining, stop)
+        if stop is not None and stop.is_set():
+            return set()
+        changed = set()
+        self._scan("", changed, set())
+        for album in pending | changed:
+            signature = self._signature(album)
+            if self._signatures.get(album) != signature:
+                self._signatures[album] = signature
+                changed.add(album)
+        for album in set(self._signatures) - pending - changed:
+            del self._signatures[album]
+        self._last_scan = time.monotonic()
+        return changed
+
+    def close(self):
+        pass
+
+class InotifySource:
+    """
+    Finds changed album folders from inotify events on every directory of the library.
+
+    Raises:
+        OSError: If inotify is unavailable or the watch limit
+            (fs.inotify.max_user_watches) is too low for the library.
+    """
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+
+        self.root = Path(root)
+        self._ctypes = ctypes
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            self._init, self._add, self._rm = libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+        except (OSError, AttributeError):
+            raise OSError("inotify is not available on this platform")
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._fd = self._init(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            self._raise_errno(str(self.root))
+        self._paths = {}
+        self._warned = False
+        try:
+            self._add_tree("", strict=True)
+        except OSError:
+            self.close()
+            raise
+
+    def _raise_errno(self, path):
+        errno = self._ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno), path)
+
+    def _add_tree(self, rel, strict=False):
+        """Watch rel and every directory below it, following symlinks."""
+        stack = [rel]
+        while stack:
+            rel = stack.pop()
+            path = os.path.join(self.root, rel)
+            wd = self._add(self._fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                if strict:
+                    self._raise_errno(path)
+                if not self._warned and self._ctypes.get_errno() == 28:  # ENOSPC: out of watches
+                    print("⚠️  inotify watch limit reached; changes in new subfolders may be missed. "
+                          "Raise fs.inotify.max_user_watches or use --poll.")
+                    self._warned = True
+                continue
+            if wd in self._paths:
+                continue  # Already watched through another link, or a symlink loop.
+            self._paths[wd] = rel
+            try:
+                stack.extend(os.path.join(rel, name) if rel else name for name in _subdirs(path))
+            except OSError:
+                continue
+
+    def _remove_tree(self, rel):
+        for wd, path in list(self._paths.items()):
+            if path == rel or path.startswith(rel + os.sep):
+                self._rm(self._fd, wd)
+                del self._paths[wd]
+
+    def _read_events(self):
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].split(b"\0", 1)[0]
+            offset += _EVENT.size + length
+            yield wd, mask, os.fsdecode(name)
+
+    def wait(self, timeout, pending, stop=None):
+        """
+        Wait up to timeout seconds and return the album folder names that changed.
+
+        Args:
+            timeout (float): Longest time to block.
+            pending (set of str): Folders waiting to settle (unused; events cover them).
+            stop (threading.Event, optional): Unused; callers keep timeouts short.
+
+        Returns:
+            set of str: Names of changed album folders.
+        """
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        changed = set()
+        if not readable:
+            return changed
+        for wd, mask, name in self._read_events():
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped: treat every album folder as changed.
+                try:
+                    changed.update(_subdirs(self.root))
+                except OSError:
+                    pass
+                continue
+            base = self._paths.get(wd)
+            if base is None:
+                continue
+            if mask & _IN_IGNORED:
+                del self._paths[wd]
+                continue
+            if not name or (not base and name.startswith(_OWN_FILES)):
+                continue
+            rel = os.path.join(base, name) if base else name
+            if mask & (_IN_CREATE | _IN_MOVED_TO):
+                # A new symlink to a directory arrives without IN_ISDIR.
+                if mask & _IN_ISDIR or os.path.isdir(os.path.join(self.root, rel)):
+                    self._add_tree(rel)
+                elif not base:
+                    continue  # A file directly in the library root.
+            elif mask & _IN_MOVED_FROM and mask & _IN_ISDIR:
+                self._remove_tree(rel)
+            elif mask & (_IN_MOVED_FROM | _IN_DELETE) and rel in self._paths.values():
+                self._remove_tree(rel)  # A watched symlinked folder went away.
+            elif not base:
+                continue
+            changed.add(_album_of(rel))
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def open_source(root, polling=False):
+    """
+    Start watching a library for changes.
+
+    Args:
+        root (str or Path): Library root.
+        polling (bool): Poll even if inotify is available, e.g. on network
+            shares whose remote changes inotify does not see.
+
+    Returns:
+        InotifySource or PollingSource: The change source; close it when done.
+    """
+    if not polling:
+        try:
+            return InotifySource(root)
+        except OSError as e:
+            print(f"⚠️  inotify unavailable ({e}); polling every {POLL_INTERVAL:g}s instead.")
+    return PollingSource(root)
+
+def settled_folders(source, stop=None, debounce=None):
+    """
+    Yield album folders once they changed and then stayed quiet for the debounce time.
+
+    Args:
+        source (InotifySource or PollingSource): Change source from open_source.
+        stop (threading.Event, optional): The generator ends once this is set.
+        debounce (float, optional): Quiet time in seconds; defaults to DEBOUNCE_SECONDS.
+
+    Yields:
+        list of Path: Settled album folders, ordered by name. Folders that were
+        removed are included, so callers can drop them from their indexes.
+    """
+    debounce = DEBOUNCE_SECONDS if debounce is None else debounce
+    last_change = {}
+    while stop is None or not stop.is_set():
+        now = time.monotonic()
+        timeout = min(last_change.values()) + debounce - now if last_change else MAX_WAIT
+        changed = source.wait(min(max(0.0, timeout), MAX_WAIT), set(last_change), stop)
+        now = time.monotonic()
+        for album in changed:
+            last_change[album] = now
+        ready = sorted(album for album, changed_at in last_change.items() if now - changed_at >= debounce)
+        if ready:
+            for album in ready:
+                del last_change[album]
+            yield [source.root / album for album in ready]
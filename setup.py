@@ -9,12 +9,13 @@ setup(
     install_requires=[
         "requests",
         "mutagen",
-        "music-tag",
         "tinytag",
         "pyacoustid",
-        "python-dotenv",
-        "musicbrainzngs"
+        "python-dotenv"
     ],
+    extras_require={
+        "images": ["Pillow"],
+    },
     entry_points={
         "console_scripts": [
             "embed_artwork = artwork_embedder.cli:main"
@@ -0,0 +1,124 @@
+# test/benchmark.py
+# Offline throughput benchmark for --folders, --files and --clean-album.
+#
+# Each mode runs the real CLI in a subprocess against a freshly generated
+# library, with every provider served by the local stand-in
+# (provider_standin.py) and a fresh cache directory. Reported per mode:
+# files/sec, provider requests per album and the peak RSS of the run.
+#
+#   python test/benchmark.py --albums 20 --tracks 12 --latency-ms 40
+#   python test/benchmark.py --extra "--jobs 4 --write-workers 2" --json results.json
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from make_library import make_library
+from provider_standin import StandinServer, make_image, standin_env
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BAND = "Bench Band"
+
+# Runs the CLI and reports the peak RSS (in KB on Linux) of it and its children on stderr.
+RUNNER = (
+    "import atexit, resource, runpy, sys\n"
+    "def report():\n"
+    "    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,\n"
+    "               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)\n"
+    "    sys.stderr.write(f'BENCH_PEAK_RSS {peak}\\n')\n"
+    "atexit.register(report)\n"
+    "sys.argv[0] = 'artwork-embedder'\n"
+    "runpy.run_module('artwork_embedder.cli', run_name='__main__')\n"
+)
+
+MODES = {
+    "folders": {"layout": "folders", "artwork": False, "args": ["--folders"]},
+    "files": {"layout": "flat", "artwork": False, "args": ["--files"]},
+    "clean": {"layout": "folders", "artwork": True, "args": ["--folders", "--clean-album", "Album"]},
+}
+
+def run_mode(mode, args, server, workdir):
+    """Generate a library for mode, run the CLI on it and return the measurements."""
+    spec = MODES[mode]
+    library = workdir / mode
+    artwork = make_image(args.image_kb, args.image_size) if spec["artwork"] else None
+    files = make_library(library, BAND, args.albums, args.tracks, spec["layout"], args.track_kb, artwork)
+
+    env = dict(os.environ, **standin_env(server.url))
+    env["ARTWORK_EMBEDDER_CACHE_DIR"] = str(workdir / f"cache-{mode}")
+    env["ACOUSTID_API_KEY"] = ""
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    cmd = [sys.executable, "-c", RUNNER, "--music-folder", str(library), "--band", BAND]
+    cmd += spec["args"] + shlex.split(args.extra)
+
+    server.reset_counts()
+    started = time.perf_counter()
+    result = subprocess.run(cmd, env=env, cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    requests = dict(server.counts)
+
+    peak_kb = 0
+    for line in result.stderr.splitlines():
+        if line.startswith("BENCH_PEAK_RSS "):
+            peak_kb = int(line.split()[1])
+    if result.returncode != 0 or args.verbose:
+        print(result.stdout)
+        print(result.stderr)
+
+    return {
+        "mode": mode,
+        "returncode": result.returncode,
+        "files": files,
+        "albums": args.albums,
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(files / elapsed, 1) if elapsed else None,
+        "requests": requests,
+        "requests_per_album": round(sum(requests.values()) / args.albums, 2),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+def print_table(results):
+    print(f"\n{'mode':<8} {'files':>6} {'seconds':>8} {'files/s':>8} {'req/album':>10} {'peak RSS MB':>12}  requests")
+    for r in results:
+        breakdown = ", ".join(f"{k}={v}" for k, v in sorted(r["requests"].items())) or "-"
+        status = "" if r["returncode"] == 0 else f"  (exit {r['returncode']})"
+        print(f"{r['mode']:<8} {r['files']:>6} {r['seconds']:>8.2f} {r['files_per_sec']:>8} "
+              f"{r['requests_per_album']:>10} {r['peak_rss_mb']:>12}  {breakdown}{status}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark artwork-embedder against local provider stand-ins.")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--albums", type=int, default=10, help="Albums in the generated library.")
+    parser.add_argument("--tracks", type=int, default=12, help="Tracks per album.")
+    parser.add_argument("--track-kb", type=int, default=64, help="Approximate size of each MP3.")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Delay added to every provider response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--itunes-miss-rate", type=float, default=0.0,
+                        help="Fraction of albums iTunes has no result for (exercises the MusicBrainz fallback).")
+    parser.add_argument("--caa-miss-rate", type=float, default=0.0, help="Fraction of releases without artwork.")
+    parser.add_argument("--image-kb", type=int, default=100, help="Size of served images.")
+    parser.add_argument("--image-size", type=int, default=600, help="Width and height of served images.")
+    parser.add_argument("--extra", default="", help='Extra CLI options, e.g. "--jobs 4".')
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of every run.")
+    args = parser.parse_args()
+
+    server = StandinServer(latency_ms=args.latency_ms, error_rate=args.error_rate,
+                           itunes_miss_rate=args.itunes_miss_rate, caa_miss_rate=args.caa_miss_rate,
+                           image_kb=args.image_kb, image_size=args.image_size).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="artwork-bench-") as tmp:
+            results = [run_mode(mode, args, server, Path(tmp)) for mode in args.modes]
+    finally:
+        server.stop()
+
+    print_table(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    sys.exit(1 if any(r["returncode"] for r in results) else 0)
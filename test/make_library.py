@@ -0,0 +1,73 @@
+# test/make_library.py
+# Generates synthetic MP3 libraries of a configurable shape for benchmarks.
+#
+#   python test/make_library.py /tmp/library --albums 20 --tracks 12
+#
+# "folders" layout: one subfolder per album, as used by --folders and
+# --clean-album. "flat" layout: every track at the top level, tagged with
+# its album, as used by --files.
+
+import argparse
+import shutil
+from pathlib import Path
+
+from mutagen.id3 import ID3, APIC, TALB, TIT2, TPE1, TRCK
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz).
+FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+def make_track(path, band, album, number, size_kb=64, artwork=None):
+    """Write one tagged MP3 of about size_kb kilobytes, with optional embedded artwork."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(FRAME * max(1, size_kb * 1024 // len(FRAME)))
+    tags = ID3()
+    tags.add(TPE1(encoding=3, text=band))
+    tags.add(TALB(encoding=3, text=album))
+    tags.add(TIT2(encoding=3, text=f"Track {number}"))
+    tags.add(TRCK(encoding=3, text=str(number)))
+    if artwork:
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=artwork))
+    tags.save(path)
+
+def make_library(root, band="Bench Band", albums=10, tracks=12, layout="folders",
+                 track_kb=64, artwork=None):
+    """
+    Create a fresh library below root, removing anything already there.
+
+    Args:
+        root (Path): Library directory.
+        band (str): Artist tag of every track.
+        albums (int): Number of albums.
+        tracks (int): Tracks per album.
+        layout (str): "folders" (one subfolder per album) or "flat" (all at top level).
+        track_kb (int): Approximate size of each MP3.
+        artwork (bytes, optional): Image embedded into every track.
+
+    Returns:
+        int: Number of tracks written.
+    """
+    root = Path(root)
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True)
+    for a in range(1, albums + 1):
+        album = f"Album {a:03d}"
+        for t in range(1, tracks + 1):
+            if layout == "flat":
+                path = root / f"{album} - {t:02d} Track {t}.mp3"
+            else:
+                path = root / f"[{2000 + a % 25}] {album}" / f"{t:02d} Track {t}.mp3"
+            make_track(path, band, album, t, track_kb, artwork)
+    return albums * tracks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic MP3 library.")
+    parser.add_argument("root", help="Directory to create (replaced if it exists).")
+    parser.add_argument("--band", default="Bench Band", help="Artist tag of every track.")
+    parser.add_argument("--albums", type=int, default=10, help="Number of albums.")
+    parser.add_argument("--tracks", type=int, default=12, help="Tracks per album.")
+    parser.add_argument("--layout", choices=["folders", "flat"], default="folders")
+    parser.add_argument("--track-kb", type=int, default=64, help="Approximate size of each MP3.")
+    args = parser.parse_args()
+
+    count = make_library(args.root, args.band, args.albums, args.tracks, args.layout, args.track_kb)
+    print(f"Wrote {count} tracks to {args.root}")
@@ -0,0 +1,195 @@
+# test/provider_standin.py
+# Local stand-in for the iTunes search, MusicBrainz ws/2/release and
+# Cover Art Archive endpoints, so benchmarks run offline and repeatably.
+#
+# Point the tool at it with the ARTWORK_EMBEDDER_ITUNES_URL,
+# ARTWORK_EMBEDDER_MUSICBRAINZ_URL and ARTWORK_EMBEDDER_COVERART_URL
+# environment variables (see standin_env). Run on its own with:
+#   python test/provider_standin.py --port 8765 --latency-ms 50
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+def _fraction(key):
+    """Map a string to a stable number in [0, 1), so hit/miss decisions repeat across runs."""
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) / 0x100000000
+
+def make_image(size_kb, dimension):
+    """
+    Build a JPEG of roughly size_kb kilobytes and dimension x dimension pixels.
+
+    The pixels come from Pillow when installed; the file is padded to the
+    requested size with JPEG comment segments, so it still decodes.
+    """
+    try:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (dimension, dimension), (90, 40, 160)).save(buffer, "JPEG", quality=90)
+        body = buffer.getvalue()[2:]
+    except ImportError:
+        body = b"\xff\xd9"
+    padding = bytearray()
+    missing = size_kb * 1024 - len(body) - 2
+    while missing > 4:
+        chunk = min(missing - 4, 65533)
+        padding += b"\xff\xfe" + (chunk + 2).to_bytes(2, "big") + b"\x00" * chunk
+        missing -= chunk + 4
+    return b"\xff\xd8" + bytes(padding) + body
+
+class StandinServer:
+    """
+    Threaded HTTP server answering the provider endpoints.
+
+    Args:
+        port (int): Port to listen on; 0 picks a free one.
+        latency_ms (float): Delay added to every response.
+        error_rate (float): Fraction of requests answered with HTTP 503.
+        itunes_miss_rate (float): Fraction of search terms iTunes has no album for.
+        caa_miss_rate (float): Fraction of releases without Cover Art Archive images.
+        image_kb (int): Size of served images.
+        image_size (int): Width and height of served images.
+    """
+
+    def __init__(self, port=0, latency_ms=0.0, error_rate=0.0, itunes_miss_rate=0.0,
+                 caa_miss_rate=0.0, image_kb=100, image_size=600, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.itunes_miss_rate = itunes_miss_rate
+        self.caa_miss_rate = caa_miss_rate
+        self.image = make_image(image_kb, image_size)
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.counts[endpoint] += 1
+            return self._random.random() < self.error_rate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path, query = parsed.path, parse_qs(parsed.query)
+                if path == "/search":
+                    endpoint = "itunes"
+                elif path.startswith("/ws/2/release"):
+                    endpoint = "musicbrainz"
+                elif path.startswith("/image/") or path.endswith(("/front-500", "/front")):
+                    endpoint = "image"
+                else:
+                    endpoint = "coverart"
+                failed = server._count(endpoint)
+                if server.latency:
+                    time.sleep(server.latency)
+                if failed:
+                    return self._send(503, b"unavailable", "text/plain")
+                if endpoint == "itunes":
+                    return self._json(server._itunes(query.get("term", [""])[0]))
+                if endpoint == "musicbrainz":
+                    return self._json(server._musicbrainz(query.get("query", [""])[0]))
+                if endpoint == "image":
+                    return self._send(200, server.image, "image/jpeg")
+                return server._coverart(self, path)
+
+            def _json(self, payload):
+                self._send(200, json.dumps(payload).encode("utf-8"), "application/json")
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def _itunes(self, term):
+        if not term or _fraction("itunes:" + term) < self.itunes_miss_rate:
+            return {"resultCount": 0, "results": []}
+        # The artist name echoes the whole term, so any expected artist in it matches.
+        return {"resultCount": 1, "results": [{
+            "artistName": term,
+            "collectionName": term,
+            "artworkUrl100": f"{self.url}/image/{quote(term)}/100x100bb.jpg",
+        }]}
+
+    def _musicbrainz(self, query):
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        releases = [{
+            "id": f"{digest[:8]}-0000-0000-0000-{i:012d}",
+            "title": query,
+            "date": "2000",
+            "release-group": {"id": f"{digest[8:16]}-0000-0000-0000-000000000000"},
+        } for i in range(3)]
+        return {"count": len(releases), "releases": releases}
+
+    def _coverart(self, handler, path):
+        mbid = path.rstrip("/").rsplit("/", 1)[-1]
+        if _fraction("caa:" + mbid) < self.caa_miss_rate:
+            return handler._send(404, b"not found", "text/plain")
+        return handler._json({"images": [{"front": True, "image": f"{self.url}{path.rstrip('/')}/front"}]})
+
+def standin_env(url):
+    """Environment variables that send every provider request to the stand-in at url."""
+    return {
+        "ARTWORK_EMBEDDER_ITUNES_URL": url,
+        "ARTWORK_EMBEDDER_MUSICBRAINZ_URL": url,
+        "ARTWORK_EMBEDDER_COVERART_URL": url,
+        "ARTWORK_EMBEDDER_ACOUSTID_URL": f"{url}/v2/lookup",
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve stand-in iTunes, MusicBrainz and Cover Art Archive endpoints.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--itunes-miss-rate", type=float, default=0.0, help="Fraction of searches without a result.")
+    parser.add_argument("--caa-miss-rate", type=float, default=0.0, help="Fraction of releases without artwork.")
+    parser.add_argument("--image-kb", type=int, default=100, help="Size of served images.")
+    parser.add_argument("--image-size", type=int, default=600, help="Width and height of served images.")
+    args = parser.parse_args()
+
+    server = StandinServer(args.port, args.latency_ms, args.error_rate, args.itunes_miss_rate,
+                           args.caa_miss_rate, args.image_kb, args.image_size).start()
+    print(f"Serving on {server.url}. Environment for the tool:")
+    for name, value in standin_env(server.url).items():
+        print(f"  export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,104 @@
+# test/startup_benchmark.py
+# Measures CLI startup time and checks that each mode only imports what it uses.
+#
+# Every case runs the CLI several times in a fresh interpreter and reports
+# the median wall time. It fails if a mode loads a module it should not:
+# --help and --clean-album must not import the HTTP stack, AcoustID, Pillow
+# or mutagen (indexing only stats files and cleaning reads ID3 frame
+# headers directly). --clean-album runs on a small library of tagged tracks
+# with artwork, so the index refresh and the clean engine are exercised;
+# --folders and --files run on an empty library so no lookups go out.
+#
+#   python test/startup_benchmark.py
+#   python test/startup_benchmark.py --runs 20 --max-ms 150
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from make_library import make_library
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ["requests", "urllib3", "acoustid", "dotenv", "PIL", "mutagen", "musicbrainzngs"]
+
+# Runs the CLI and reports which of the heavy modules it imported on stderr.
+RUNNER = (
+    "import atexit, json, runpy, sys\n"
+    f"HEAVY = {HEAVY!r}\n"
+    "atexit.register(lambda: sys.stderr.write('BENCH_MODULES ' + json.dumps([m for m in HEAVY if m in sys.modules]) + '\\n'))\n"
+    "sys.argv[0] = 'artwork-embedder'\n"
+    "runpy.run_module('artwork_embedder.cli', run_name='__main__')\n"
+)
+
+# name -> (CLI arguments, modules that must not be imported, library: "empty" or "tracks")
+CASES = {
+    "help": (["--help"], ["requests", "urllib3", "acoustid", "dotenv", "PIL", "mutagen", "musicbrainzngs"], "empty"),
+    "clean": (["--folders", "--clean-album", "Album"], ["requests", "urllib3", "acoustid", "dotenv", "PIL",
+                                                        "mutagen", "musicbrainzngs"], "tracks"),
+    "folders": (["--folders", "--band", "Band"], ["musicbrainzngs"], "empty"),
+    "files": (["--files", "--band", "Band"], ["musicbrainzngs"], "empty"),
+}
+
+# Stand-in artwork embedded into the "tracks" library, so cleaning has frames to remove.
+ARTWORK = b"\xff\xd8\xff\xe0" + b"\x00" * 4096
+
+def run_case(args, library, cache):
+    env = dict(os.environ, ARTWORK_EMBEDDER_CACHE_DIR=str(cache))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    cmd = [sys.executable, "-c", RUNNER, "--music-folder", str(library)] + args
+    started = time.perf_counter()
+    result = subprocess.run(cmd, env=env, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    modules = []
+    for line in result.stderr.splitlines():
+        if line.startswith("BENCH_MODULES "):
+            modules = json.loads(line[len("BENCH_MODULES "):])
+    return elapsed, modules
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup and check lazy imports.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per case (median is reported).")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--max-ms", type=float, help="Fail if the --help or clean median exceeds this.")
+    args = parser.parse_args()
+
+    bare = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        bare.append(time.perf_counter() - started)
+    baseline = statistics.median(bare)
+    print(f"Bare interpreter: {baseline * 1000:.1f} ms")
+
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="artwork-startup-") as tmp:
+        libraries = {"empty": Path(tmp) / "library", "tracks": Path(tmp) / "tracks"}
+        cache = Path(tmp) / "cache"
+        libraries["empty"].mkdir()
+        make_library(libraries["tracks"], albums=3, tracks=4, track_kb=16, artwork=ARTWORK)
+        print(f"\n{'case':<8} {'median ms':>10} {'over bare':>10}  heavy modules imported")
+        for name in args.cases:
+            cli_args, forbidden, library = CASES[name]
+            timings, modules = [], []
+            for _ in range(args.runs):
+                elapsed, modules = run_case(cli_args, libraries[library], cache)
+                timings.append(elapsed)
+            median = statistics.median(timings)
+            unexpected = [m for m in modules if m in forbidden]
+            notes = []
+            if unexpected:
+                notes.append(f"FAIL: should not import {', '.join(unexpected)}")
+            if args.max_ms and name in ("help", "clean") and median * 1000 > args.max_ms:
+                notes.append(f"FAIL: slower than {args.max_ms:.0f} ms")
+            failed = failed or bool(notes)
+            print(f"{name:<8} {median * 1000:>10.1f} {(median - baseline) * 1000:>10.1f}  "
+                  f"{', '.join(modules) or '-'}{'  ' + '; '.join(notes) if notes else ''}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,135 @@
+# test/test_clean_engine.py
+# Checks the header-only artwork remover on generated tracks: picture
+# frames disappear while every other frame, the audio bytes and the file
+# size stay the same (ID3v2.3 and v2.4, frames on both sides of the
+# pictures), dry runs and files without pictures are never written, and
+# tags whose frame table cannot be patched in place (v2.4 written with
+# non-syncsafe frame sizes) are handed to mutagen.
+#
+#   python test/test_clean_engine.py
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mutagen.id3 import ID3, APIC, COMM, TXXX
+
+from artwork_embedder import clean_engine
+from make_library import FRAME, make_track
+
+COVER = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 20
+BACK = b"\x89PNG\r\n\x1a\n" + b"\x01" * 3000
+
+def _make_track(path, version=4):
+    """Write a track with two pictures and text frames before and after them."""
+    make_track(path, "Band", "Album", 1, size_kb=16, artwork=COVER)
+    tags = ID3(path)
+    tags.add(APIC(encoding=3, mime="image/png", type=4, desc="Back", data=BACK))
+    tags.add(TXXX(encoding=3, desc="after", text="kept"))
+    tags.add(COMM(encoding=3, lang="eng", desc="", text="comment"))
+    tags.save(path, v2_version=version)
+    _interleave_pictures(path)
+    return path
+
+def _interleave_pictures(path):
+    """Reorder the frames so each picture sits between text frames (mutagen writes pictures last)."""
+    data = bytearray(path.read_bytes())
+    with open(path, "rb") as f:
+        frames, frames_end = clean_engine.read_frame_table(f)
+    chunk = lambda frame: bytes(data[frame.offset:frame.offset + frame.length])
+    texts = [chunk(frame) for frame in frames if frame.id != b"APIC"]
+    pictures = [chunk(frame) for frame in frames if frame.id == b"APIC"]
+    ordered = texts[:2] + pictures[:1] + texts[2:4] + pictures[1:] + texts[4:]
+    data[10:frames_end] = b"".join(ordered)
+    path.write_bytes(bytes(data))
+
+def _tag_end(data):
+    return 10 + clean_engine._syncsafe(data[6:10])
+
+def _other_frames(path):
+    """Every frame except pictures, as comparable text."""
+    return sorted((key, repr(frame)) for key, frame in ID3(path).items() if not key.startswith("APIC"))
+
+def _check_strip(version):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _make_track(Path(tmp) / "track.mp3", version)
+        before = path.read_bytes()
+        frames = _other_frames(path)
+        with open(path, "rb") as f:
+            table, _ = clean_engine.read_frame_table(f)
+        first_picture = min(frame.offset for frame in table if frame.id == b"APIC")
+        assert any(frame.offset > first_picture and frame.id != b"APIC" for frame in table), \
+            "fixture should have frames after the pictures"
+
+        result = clean_engine.clean_file(path)
+
+        after = path.read_bytes()
+        assert (result.status, result.pictures) == ("removed", 2), result
+        assert ID3(path).getall("APIC") == []
+        assert _other_frames(path) == frames
+        assert after[3] == version
+        assert len(after) == len(before)
+        assert _tag_end(after) == _tag_end(before)
+        assert after[_tag_end(after):] == before[_tag_end(before):]
+
+def test_strip_v24_keeps_other_frames_and_audio():
+    _check_strip(4)
+
+def test_strip_v23_keeps_other_frames_and_audio():
+    _check_strip(3)
+
+def test_dry_run_and_clean_files_are_not_written():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _make_track(Path(tmp) / "track.mp3")
+        before = path.read_bytes()
+        result = clean_engine.clean_file(path, dry_run=True)
+        assert (result.status, result.pictures) == ("would_remove", 2), result
+        assert path.read_bytes() == before
+
+        clean_engine.clean_file(path)
+        stripped = path.read_bytes()
+        assert clean_engine.clean_file(path).status == "no_artwork"
+        assert path.read_bytes() == stripped
+
+        untagged = Path(tmp) / "untagged.mp3"
+        untagged.write_bytes(FRAME * 8)
+        assert clean_engine.clean_file(untagged).status == "no_tags"
+        assert untagged.read_bytes() == FRAME * 8
+
+def test_non_syncsafe_v24_falls_back_to_backend():
+    # A v2.3 tag relabelled as v2.4 keeps plain 32-bit frame sizes, as some
+    # encoders write them; the pictures' sizes are not valid syncsafe integers.
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _make_track(Path(tmp) / "track.mp3", version=3)
+        data = bytearray(path.read_bytes())
+        data[3] = 4
+        path.write_bytes(bytes(data))
+        audio = bytes(data[_tag_end(data):])
+        frames = _other_frames(path)
+        try:
+            clean_engine.strip_in_place(path)
+            assert False, "strip_in_place should refuse non-syncsafe frame sizes"
+        except clean_engine.UnsupportedTag:
+            pass
+        assert path.read_bytes() == bytes(data)
+
+        result = clean_engine.clean_file(path)
+
+        after = path.read_bytes()
+        assert (result.status, result.pictures) == ("removed", 2), result
+        assert ID3(path).getall("APIC") == []
+        assert _other_frames(path) == frames
+        assert after[_tag_end(after):] == audio
+
+if __name__ == "__main__":
+    failed = False
+    for name, test in [(n, f) for n, f in sorted(globals().items()) if n.startswith("test_")]:
+        try:
+            test()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ {name}: {e}")
+    sys.exit(1 if failed else 0)
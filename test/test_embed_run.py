@@ -7,6 +7,7 @@
 import os
 import shutil
 import subprocess
+import sys
 from pathlib import Path
 from mutagen.id3 import ID3, APIC, ID3NoHeaderError
 
@@ -18,7 +19,7 @@ FILENAME_1A1B = "Rainy.mp3"
 FILENAME_2 = ORIG_FILENAME
 BAND = "Cosmonkey"
 ALBUM = "Rainy"
-SCRIPT_PATH = Path(__file__).resolve().parent.parent / "embed_artwork.py"
+REPO_ROOT = Path(__file__).resolve().parent.parent
 
 # Define the different test scenarios
 cases = {
@@ -73,7 +74,7 @@ def run_case(key, config):
     print(f"Searching MusicBrainz for: {BAND} - {ALBUM}")
 
     cmd = [
-        "python3", str(SCRIPT_PATH),
+        sys.executable, "-m", "artwork_embedder.cli",
         "--music-folder", str(folder.parent.parent if config["args"] == ["--folders"] else folder),
         "--band", BAND
     ]
@@ -83,7 +84,8 @@ def run_case(key, config):
 
     cmd += config["args"]
 
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
     print("=== STDOUT ===")
     print(result.stdout)
     print("=== STDERR ===")
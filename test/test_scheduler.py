@@ -0,0 +1,70 @@
+# test/test_scheduler.py
+# Checks the per-host token bucket without touching the network: requests
+# are spaced at the configured rate, and callers queued during a
+# Retry-After pause are released one at a time afterwards instead of all
+# at once.
+#
+#   python test/test_scheduler.py
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from artwork_embedder.scheduler import TokenBucket
+
+def _fire_times(bucket, callers, started):
+    """Start callers threads acquiring from bucket; return when each got its token."""
+    times = []
+    lock = threading.Lock()
+
+    def caller():
+        bucket.acquire()
+        with lock:
+            times.append(time.monotonic() - started)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(times)
+
+def _assert_close(actual, expected, tolerance=0.15):
+    assert len(actual) == len(expected), (actual, expected)
+    for got, want in zip(actual, expected):
+        assert abs(got - want) <= tolerance, f"fired at {[round(t, 2) for t in actual]}, expected {expected}"
+
+def test_rate_spacing():
+    bucket = TokenBucket(rate=10.0, burst=1)
+    started = time.monotonic()
+    _assert_close(_fire_times(bucket, 4, started), [0.0, 0.1, 0.2, 0.3])
+
+def test_pause_spaces_queued_requests():
+    # 1 request/s, burst 1: after a 2 s pause, four queued callers must go
+    # out at 2, 3, 4 and 5 s, not together when the pause ends.
+    bucket = TokenBucket(rate=1.0, burst=1)
+    bucket.acquire()
+    started = time.monotonic()
+    bucket.pause(2.0)
+    _assert_close(_fire_times(bucket, 4, started), [2.0, 3.0, 4.0, 5.0])
+
+def test_pause_drops_burst():
+    # A full burst of 5 must not be released in one go after a pause.
+    bucket = TokenBucket(rate=5.0, burst=5)
+    started = time.monotonic()
+    bucket.pause(0.5)
+    _assert_close(_fire_times(bucket, 3, started), [0.5, 0.7, 0.9])
+
+if __name__ == "__main__":
+    failed = False
+    for name, test in [(n, f) for n, f in sorted(globals().items()) if n.startswith("test_")]:
+        try:
+            test()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ {name}: {e}")
+    sys.exit(1 if failed else 0)